@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from models import User, ConnectionRequest, Post
+
+# Synthetic social graph generator.
+# Degrees follow a power law (preferential attachment) and most edges stay within
+# a user's school year. Every row is validated through the app's own models and
+# written as NDJSON in the layout utils/bulk_import.py reads, so a dataset can be
+# loaded with the bulk import CLI/endpoint or directly with --load.
+
+FIRST_NAMES = [
+    "Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn",
+    "Priya", "Wei", "Omar", "Sofia", "Mateo", "Aisha", "Kenji", "Lena", "Noah", "Zara",
+]
+LAST_NAMES = [
+    "Smith", "Chen", "Patel", "Garcia", "Kim", "Nguyen", "Okafor", "Rossi", "Silva", "Novak",
+    "Cohen", "Haddad", "Ivanova", "Tanaka", "Jensen", "Murphy", "Ali", "Lopez", "Park", "Singh",
+]
+SCHOOL_YEARS = (1, 2, 3, 4)
+# Post visibility is skewed towards close circles
+VISIBILITY_WEIGHTS = {1: 35, 2: 25, 3: 18, 4: 10, 5: 7, 6: 5}
+
+def seeded_uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+# Generate the dataset and write users/connections/posts NDJSON files into out_dir.
+# edges is the target number of undirected connections; same_year is the share of
+# edges that attach within the new user's school year.
+def generate(out_dir: str, users: int, edges: int, posts: int, seed: int = 42, same_year: float = 0.7) -> dict:
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    per_user = max(1, round(edges / max(users, 1)))
+
+    ids: List[str] = []
+    years: List[int] = []
+    # Each user appears once per incident edge (plus once on creation), so a uniform
+    # pick from these lists is a degree-proportional pick
+    endpoints: List[int] = []
+    endpoints_by_year = {year: [] for year in SCHOOL_YEARS}
+    edge_count = 0
+
+    with open(os.path.join(out_dir, "users.ndjson"), "w") as users_file, \
+            open(os.path.join(out_dir, "connections.ndjson"), "w") as connections_file:
+        for position in range(users):
+            year = rng.choice(SCHOOL_YEARS)
+            user = User(
+                id=seeded_uuid(rng),
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                email=f"user{position}@example.edu",
+                school_year=year,
+                invited_by=ids[rng.randrange(position)] if position and rng.random() < 0.3 else None,
+            )
+            users_file.write(user.model_dump_json() + "\n")
+
+            targets = set()
+            for _ in range(min(per_user, position)):
+                pool = endpoints_by_year[year] if endpoints_by_year[year] and rng.random() < same_year else endpoints
+                targets.add(pool[rng.randrange(len(pool))])
+            for target in targets:
+                connection = ConnectionRequest(user1=user.id, user2=ids[target])
+                connections_file.write(connection.model_dump_json() + "\n")
+                endpoints.append(target)
+                endpoints_by_year[years[target]].append(target)
+                edge_count += 1
+
+            ids.append(str(user.id))
+            years.append(year)
+            for _ in range(len(targets) + 1):
+                endpoints.append(position)
+                endpoints_by_year[year].append(position)
+
+    now = datetime(2024, 1, 1)
+    degrees, weights = zip(*VISIBILITY_WEIGHTS.items())
+    with open(os.path.join(out_dir, "posts.ndjson"), "w") as posts_file:
+        for _ in range(posts if users else 0):
+            # Active (well connected) users post more
+            author = endpoints[rng.randrange(len(endpoints))]
+            post = Post(
+                id=seeded_uuid(rng),
+                content=f"Post {rng.getrandbits(32):08x}",
+                author_id=ids[author],
+                visibility_degree=rng.choices(degrees, weights)[0],
+                timestamp=now - timedelta(seconds=rng.randrange(30 * 24 * 3600)),
+            )
+            posts_file.write(post.model_dump_json() + "\n")
+
+    manifest = {
+        "seed": seed,
+        "users": users,
+        "connections": edge_count,
+        "posts": posts if users else 0,
+        "same_year": same_year,
+        "generated_at": datetime.now().isoformat(),
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+# Load a generated dataset into Neo4j through the bulk import pipeline
+async def load(out_dir: str, batch_size: int) -> List[dict]:
+    from utils.bulk_import import run_import
+
+    reports = []
+    for kind in ("users", "connections", "posts"):
+        reports.append(await run_import(kind, os.path.join(out_dir, f"{kind}.ndjson"), "ndjson", batch_size))
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Connect3 social graph")
+    parser.add_argument("--out", default="benchmark_data")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--edges", type=int, default=5000, help="target number of connections")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--same-year", type=float, default=0.7, help="share of edges within a school year")
+    parser.add_argument("--load", action="store_true", help="import the dataset into Neo4j afterwards")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    manifest = generate(args.out, args.users, args.edges, args.posts, args.seed, args.same_year)
+    print(json.dumps(manifest, indent=2))
+    if args.load:
+        for report in asyncio.run(load(args.out, args.batch_size)):
+            print(json.dumps({key: value for key, value in report.items() if key not in ("invalid_rows", "failed_batches")}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.report import summarize
+
+# Load driver for the main API endpoints.
+# Targets a running server (--url) or the app in-process through httpx's ASGI
+# transport (--in-process), which skips HTTP/uvicorn overhead but still goes
+# through FastAPI and the real Neo4j driver. Either way a Neo4j instance with the
+# generated dataset loaded is required; --in-process is not a stand-in backend.
+
+DEFAULT_MIX = "user_by_email=40,connections=25,feed=25,connect=5,post=5"
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REQUESTS:
+            raise ValueError(f"Unknown endpoint in mix: {name} (choose from {', '.join(REQUESTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+# Reservoir sample of generated users, so huge datasets are not read into memory
+def sample_users(path: str, limit: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    sample = []
+    with open(path) as users_file:
+        for seen, line in enumerate(users_file):
+            user = json.loads(line)
+            entry = {"id": user["id"], "email": user["email"]}
+            if len(sample) < limit:
+                sample.append(entry)
+            else:
+                slot = rng.randrange(seen + 1)
+                if slot < limit:
+                    sample[slot] = entry
+    return sample
+
+async def get_user_by_email(client, rng, users):
+    user = rng.choice(users)
+    return await client.get(f"/users/email/{user['email']}")
+
+async def get_connections(client, rng, users):
+    user = rng.choice(users)
+    return await client.get(f"/users/{user['email']}/connections")
+
+async def get_feed(client, rng, users):
+    user = rng.choice(users)
+    return await client.get(f"/feed/{user['id']}")
+
+async def connect_by_email(client, rng, users):
+    user1, user2 = rng.sample(users, 2)
+    return await client.post("/connect_users_by_email", json={"email1": user1["email"], "email2": user2["email"]})
+
+async def create_post(client, rng, users):
+    user = rng.choice(users)
+    return await client.post("/posts", json={
+        "content": f"benchmark post {rng.getrandbits(32):08x}",
+        "author_id": user["id"],
+        "visibility_degree": rng.randint(1, 6),
+    })
+
+REQUESTS = {
+    "user_by_email": get_user_by_email,
+    "connections": get_connections,
+    "feed": get_feed,
+    "connect": connect_by_email,
+    "post": create_post,
+}
+
+# Run concurrency workers until duration seconds pass (or max_requests are sent).
+# Non-2xx responses and transport errors count as errors, not latency samples.
+async def drive(client: httpx.AsyncClient, users: List[dict], mix: Dict[str, float], concurrency: int,
+                duration: float, max_requests: Optional[int], seed: int) -> dict:
+    latencies = {name: [] for name in mix}
+    errors = {name: 0 for name in mix}
+    names, weights = zip(*mix.items())
+    sent = 0
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker(worker_id: int):
+        nonlocal sent
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            sent += 1
+            name = rng.choices(names, weights)[0]
+            request_started = time.perf_counter()
+            try:
+                response = await REQUESTS[name](client, rng, users)
+                ok = response.status_code < 300
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[name].append(time.perf_counter() - request_started)
+            else:
+                errors[name] += 1
+
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+# The app finishes its database startup work (schema, graph index, timelines)
+# in the background; measure only once it reports ready
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        response = await client.get("/health/ready")
+        if response.status_code == 200:
+            return
+        if time.perf_counter() > deadline:
+            raise SystemExit(f"App not ready after {timeout}s: {response.text}")
+        await asyncio.sleep(0.5)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    users = sample_users(os.path.join(args.data, "users.ndjson"), args.sample_users, args.seed)
+    if len(users) < 2:
+        raise SystemExit("Need at least two users in the dataset")
+    mix = parse_mix(args.mix)
+
+    if args.in_process:
+        from main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=args.timeout) as client:
+                await wait_until_ready(client, args.timeout)
+                results = await drive(client, users, mix, args.concurrency, args.duration, args.requests, args.seed)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            results = await drive(client, users, mix, args.concurrency, args.duration, args.requests, args.seed)
+
+    manifest_path = os.path.join(args.data, "manifest.json")
+    dataset = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            dataset = json.load(manifest_file)
+
+    return {
+        "meta": {
+            "git_commit": git_commit(),
+            "started_at": datetime.now().isoformat(),
+            "target": "in-process" if args.in_process else args.url,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "mix": mix,
+            "seed": args.seed,
+            "dataset": dataset,
+        },
+        **results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive load against the Connect3 API and report latency percentiles")
+    parser.add_argument("--data", default="benchmark_data", help="directory written by benchmarks.generate")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="call the app through ASGI instead of HTTP (still needs Neo4j)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated endpoint=weight pairs")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--sample-users", type=int, default=10000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import math
+from typing import Dict, List
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+# Per-endpoint throughput and latency summary (latencies in seconds, reported in ms)
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    endpoints = {}
+    all_latencies = []
+    for name, values in sorted(latencies.items()):
+        values = sorted(values)
+        all_latencies.extend(values)
+        endpoints[name] = summarize_values(values, errors.get(name, 0), elapsed)
+    return {
+        "endpoints": endpoints,
+        "total": summarize_values(sorted(all_latencies), sum(errors.values()), elapsed),
+    }
+
+def summarize_values(values: List[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(1000 * sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(1000 * percentile(values, 0.50), 3),
+        "p95_ms": round(1000 * percentile(values, 0.95), 3),
+        "p99_ms": round(1000 * percentile(values, 0.99), 3),
+        "max_ms": round(1000 * values[-1], 3) if values else 0.0,
+    }
+
+# Side-by-side comparison of two benchmark reports (e.g. two commits)
+def compare(baseline: dict, candidate: dict) -> dict:
+    comparison = {}
+    names = sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))
+    for name in names + ["total"]:
+        before = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+        after = candidate["total"] if name == "total" else candidate["endpoints"].get(name)
+        if not before or not after:
+            continue
+        comparison[name] = {
+            metric: {
+                "baseline": before[metric],
+                "candidate": after[metric],
+                "change_pct": round(100 * (after[metric] - before[metric]) / before[metric], 1) if before[metric] else None,
+            }
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return {
+        "baseline": baseline.get("meta", {}).get("git_commit"),
+        "candidate": candidate.get("meta", {}).get("git_commit"),
+        "endpoints": comparison,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        print(json.dumps(compare(json.load(baseline_file), json.load(candidate_file)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,223 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from neo4j import GraphDatabase
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
+from neo4j.exceptions import ConstraintError
 import os
 from dotenv import load_dotenv
 import uuid
 from typing import Optional, List
 from uuid import UUID
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
+import json
+import time
+from models import User, ConnectionRequest, ConnectionByNameRequest, ConnectionByEmailRequest, Post, UserBatchRequest, DistanceBatchRequest
+from utils.neo4j_utils import fetch_single, fetch_all
+from utils.traversal import MAX_DEGREE, SEPARATION_NODE_BUDGET, bfs_distances, bidirectional_search
+from utils.schema import ensure_schema, describe_schema
+from utils.bulk_import import IMPORT_KINDS, IMPORT_FORMATS, DEFAULT_BATCH_SIZE, import_rows, stream_lines
+from utils.user_cache import UserCache
+from utils.network import DEFAULT_NETWORK_NODES, MAX_NETWORK_NODES, expand_network, neighbors_from_db, names_from_db
+from utils.timelines import TimelineStore, FEED_FANOUT_ENABLED, TIMELINE_REBUILD_POSTS, TIMELINE_REFRESH_SECONDS
+from utils.timelines import refresh_periodically as refresh_timelines_periodically
+from utils.graph_index import (GraphIndex, GRAPH_INDEX_ENABLED, GRAPH_INDEX_RELOAD_SECONDS, refresh_periodically,
+                               shutdown_workers)
+from utils.suggestions import SuggestionIndex, SUGGESTIONS_ENABLED, SUGGESTIONS_REBUILD_SECONDS
+from utils.suggestions import refresh_periodically as refresh_suggestions_periodically
+from utils.distance_oracle import DistanceOracle, DISTANCE_ORACLE_ENABLED
+from utils.components import ComponentTracker, COMPONENTS_ENABLED, COMPONENTS_RELOAD_SECONDS
+from utils.components import refresh_periodically as refresh_components_periodically
+from utils.user_search import (UserSearchIndex, USER_SEARCH_INDEX_ENABLED, SEARCH_MAX_CANDIDATES,
+                               classify, normalize, rank_page, fulltext_query)
+from utils.versioning import VersionRegistry, ResponseCache, etag_matches
+from utils.write_queue import (WriteBatcher, WRITE_QUEUE_ENABLED, connect_batch,
+                               create_users_and_connect_batch, create_posts_batch)
+from utils.metrics import metrics, named_query, InstrumentedSession, RequestMetricsMiddleware
+from utils.admission import (build_gates, GatedSession, Overloaded, QueryTimeout, ROUTE_QUERY_TIMEOUT_SECONDS,
+                              FEED_DEGRADED_ENABLED, DEGRADED_FEED_DEPTH)
+from utils.driver import create_driver, warm_up, check_database, pool_config, NEO_MAX_POOL_SIZE, NEO_CONNECTION_TIMEOUT
 
 # Load environment variables
 load_dotenv()
 
+# The Neo4j driver is created in the lifespan (see utils/driver.py for the pool
+# settings), so importing this module never needs the database
+driver = None
+
+# Bound on each readiness probe round trip, and the pause between startup retries
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+# Progress of the database-dependent startup work, reported by /health/ready
+startup_state = {"complete": False, "error": None}
+
+# Micro-batching write queues, created in the lifespan when WRITE_QUEUE_ENABLED
+write_queues = None
+
+# Admission gates: "expensive" for traversals (feed, network, separation, distances,
+# dashboard), "cheap" for everything else that uses a session (see utils/admission.py)
+gates = build_gates()
+
+# Read-through cache of user records (USER_CACHE_SIZE / USER_CACHE_TTL_SECONDS)
+user_cache = UserCache()
+
+# Optional in-memory copy of the CONNECTED_TO graph (GRAPH_INDEX_ENABLED)
+graph_index = GraphIndex() if GRAPH_INDEX_ENABLED else None
+
+# Optional precomputed "people you may know" lists, derived from the graph index (SUGGESTIONS_ENABLED)
+suggestion_index = SuggestionIndex() if SUGGESTIONS_ENABLED and graph_index is not None else None
+
+# Optional landmark distance index over the graph index (DISTANCE_ORACLE_ENABLED)
+distance_oracle = DistanceOracle() if DISTANCE_ORACLE_ENABLED and graph_index is not None else None
+
+# Optional union-find connected components, to answer "unreachable" without a search (COMPONENTS_ENABLED)
+components = ComponentTracker() if COMPONENTS_ENABLED else None
+
+# Version counters and rendered bodies for conditional GETs on connections and feeds
+versions = VersionRegistry()
+response_cache = ResponseCache()
+
+# Optional in-process typeahead index (USER_SEARCH_INDEX_ENABLED)
+user_search = UserSearchIndex() if USER_SEARCH_INDEX_ENABLED else None
+
+# Optional fan-out-on-write feed timelines (FEED_FANOUT_ENABLED)
+timelines = TimelineStore() if FEED_FANOUT_ENABLED else None
+
+# Fire-and-forget work started by requests (reloads and rebuilds). The event loop
+# only keeps weak references to tasks, so they are held here until they finish.
+background_jobs = set()
+
+def start_background(coro):
+    task = asyncio.create_task(coro)
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    return task
+
+# Rebuild the structures tied to the current graph index positions.
+# Suggestions are keyed by user id and rebuilt on their own schedule.
+async def rebuild_graph_derived():
+    if distance_oracle is not None:
+        await distance_oracle.rebuild(graph_index)
+
+async def reload_graph_index():
+    await graph_index.reload(driver)
+    await rebuild_graph_derived()
+
+# Startup work that needs Neo4j. Runs in the background so a worker starts serving
+# (and answering /health/live) straight away, and retries until the database is up.
+async def prepare_database():
+    # Connectivity, warm-up and schema are retried together: the database can
+    # still drop out between a successful ping and the schema statements
+    while True:
+        error = await check_database(driver, NEO_CONNECTION_TIMEOUT)
+        if error is None:
+            try:
+                warmed = await warm_up(driver)
+                if warmed:
+                    print(f"Opened {warmed} pooled Neo4j connections")
+
+                # Create missing constraints and indexes
+                schema_report = await ensure_schema(driver)
+                for name, schema_error in schema_report["failed"].items():
+                    print(f"Failed to apply schema item {name}: {schema_error}")
+                break
+            except Exception as e:
+                error = str(e)
+        startup_state["error"] = error
+        print(f"Failed to prepare Neo4j, retrying in {STARTUP_RETRY_SECONDS}s: {error}")
+        await asyncio.sleep(STARTUP_RETRY_SECONDS)
+    startup_state["error"] = None
+
+    if user_search is not None:
+        try:
+            await user_search.reload(driver)
+        except Exception as e:
+            print(f"Failed to load user search index: {str(e)}")
+
+    if components is not None:
+        try:
+            await components.reload(driver)
+        except Exception as e:
+            print(f"Failed to load components: {str(e)}")
+
+    # Load the graph index and what is derived from it
+    if graph_index is not None:
+        try:
+            await reload_graph_index()
+        except Exception as e:
+            print(f"Failed to load graph index: {str(e)}")
+
+    if suggestion_index is not None and graph_index.ready:
+        try:
+            await suggestion_index.rebuild(graph_index, driver)
+        except Exception as e:
+            print(f"Failed to build suggestions: {str(e)}")
+
+    # Materialize feed timelines once the graph index can answer audience queries
+    if timelines is not None:
+        try:
+            await rebuild_timelines()
+        except Exception as e:
+            print(f"Failed to build feed timelines: {str(e)}")
+
+    startup_state["complete"] = True
+
+# One queue per batched write path; each falls back to the single-item write
+def build_write_queues() -> dict:
+    def session_factory():
+        return driver.session()
+
+    queues = {}
+    for key in CONNECT_KEYS:
+        async def connect_one(session, item, key=key):
+            return await write_connection(session, key, item["user1"], item["user2"])
+        queues[f"connect_by_{key}"] = WriteBatcher(f"connect_by_{key}", session_factory, connect_batch(key), connect_one)
+    queues["create_user_and_connect"] = WriteBatcher(
+        "create_user_and_connect", session_factory, create_users_and_connect_batch, write_user_and_connection
+    )
+    queues["posts"] = WriteBatcher("posts", session_factory, create_posts_batch, write_post)
+    return queues
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global driver, write_queues
+    driver = create_driver()
+    if WRITE_QUEUE_ENABLED:
+        write_queues = build_write_queues()
+
+    background_tasks = [asyncio.create_task(prepare_database())]
+    # Keep the graph index fresh in the background
+    if graph_index is not None:
+        background_tasks.append(asyncio.create_task(
+            refresh_periodically(graph_index, driver, GRAPH_INDEX_RELOAD_SECONDS, rebuild_graph_derived)
+        ))
+    if suggestion_index is not None:
+        background_tasks.append(asyncio.create_task(
+            refresh_suggestions_periodically(suggestion_index, graph_index, driver, SUGGESTIONS_REBUILD_SECONDS)
+        ))
+    if components is not None:
+        background_tasks.append(asyncio.create_task(
+            refresh_components_periodically(components, driver, COMPONENTS_RELOAD_SECONDS)
+        ))
+    if timelines is not None:
+        background_tasks.append(asyncio.create_task(
+            refresh_timelines_periodically(rebuild_timelines, TIMELINE_REFRESH_SECONDS)
+        ))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    shutdown_workers()
+    if write_queues is not None:
+        for queue in write_queues.values():
+            queue.close()
+    await driver.close()
+
 # Initialize app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -21,117 +226,131 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "Retry-After"],
 )
 
-# Neo4j configuration with error handling
-NEO_URI = os.getenv("NEO_URI")
-NEO_USER = os.getenv("NEO_USER")
-NEO_PASS = os.getenv("NEO_PASS")
-
-if not all([NEO_URI, NEO_USER, NEO_PASS]):
-    raise ValueError("Missing required Neo4j environment variables")
-
-try:
-    driver = GraphDatabase.driver(NEO_URI, auth=(NEO_USER, NEO_PASS))
-    # Test the connection
-    with driver.session() as session:
-        session.run("RETURN 1")
-except Exception as e:
-    print(f"Failed to connect to Neo4j: {str(e)}")
-    raise
-
-# Models
-class User(BaseModel):
-    id: uuid.UUID
-    name: str
-    email: EmailStr
-    school_year: int
-    num_of_connections: int = 0
-    invited_by: Optional[uuid.UUID] = None
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "id": "123e4567-e89b-12d3-a456-426614174000",
-                "name": "John Doe",
-                "email": "john@example.com",
-                "school_year": 2,
-                "num_of_connections": 0,
-                "invited_by": None
-            }
-        }
+# Per-route latency and database round trips, exposed at /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
-class ConnectionRequest(BaseModel):
-    user1: uuid.UUID
-    user2: uuid.UUID
+# Database session management.
+# With a gate, every transaction on the session runs under that gate's timeout
+# (or the given per-endpoint one).
+@asynccontextmanager
+async def open_session(gate=None, timeout: Optional[float] = None):
+    async with driver.session() as session:
+        metrics.sessions_opened += 1
+        metrics.sessions_in_use += 1
+        try:
+            yield InstrumentedSession(GatedSession(session, gate, timeout) if gate is not None else session)
+        finally:
+            metrics.sessions_in_use -= 1
 
-class ConnectionByNameRequest(BaseModel):
-    name1: str
-    name2: str
+# A session held under one of the admission gates; raises Overloaded (503 with
+# Retry-After) when the gate's queue is full
+@asynccontextmanager
+async def gated_session(gate, timeout: Optional[float] = None):
+    if driver is None:
+        raise HTTPException(status_code=503, detail="Database driver is not initialized")
+    async with gate.slot():
+        try:
+            async with open_session(gate, timeout) as session:
+                yield session
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
 
-# Database session management
-def get_neo4j_session():
-    try:
-        with driver.session() as session:
+async def get_neo4j_session():
+    async with gated_session(gates["cheap"]) as session:
+        yield session
+
+# For the traversal endpoints: Depends(expensive_session("separation")) runs
+# under the expensive gate with that route's transaction timeout
+def expensive_session(route: str):
+    async def get_expensive_session():
+        async with gated_session(gates["expensive"], ROUTE_QUERY_TIMEOUT_SECONDS[route]) as session:
             yield session
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
+    return get_expensive_session
+
+# A streamed response outlives its request, so it takes its own slot while it
+# runs. Shed it with a 503 before the response starts when the gate is full;
+# once streaming, a late Overloaded can only abort the stream.
+def admit_stream(gate):
+    if gate.full:
+        gate.reject()
 
 # Helper functions
-def find_by_email(session, email: str):
+
+# Conditional GET served from versions alone, before any database work: 304 when
+# the client already has this ETag, the cached body when we rendered it before
+def cached_response(request: Request, etag: str, version) -> Optional[Response]:
+    headers = {"ETag": etag, "Last-Modified": versions.last_modified(version), "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    body = response_cache.get(etag)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    return None
+
+# Render a response body and, unless what it depends on changed while it was
+# being computed (version newer than seq_before), tag and cache it. key names the
+# request independent of version, for serving the last body when degraded.
+def versioned_response(content: dict, etag: str, version, seq_before: int, key: Optional[str] = None) -> Response:
+    body = JSONResponse(content=jsonable_encoder(content)).body
+    if version[0] > seq_before:
+        return Response(content=body, media_type="application/json")
+    response_cache.put(etag, body, key)
+    headers = {"ETag": etag, "Last-Modified": versions.last_modified(version), "Cache-Control": "private, no-cache"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Neo4j temporal values (e.g. post timestamps) are converted to Python types for JSON responses
+def to_native(value):
+    return value.to_native() if hasattr(value, "to_native") else value
+
+# Shape a User node for API responses
+def user_to_dict(user) -> dict:
+    return {
+        "id": user["id"],
+        "name": user["name"],
+        "email": user["email"],
+        "school_year": user["school_year"],
+        "num_of_connections": user["num_of_connections"],
+        "invited_by": user.get("invited_by")
+    }
+
+async def find_by_email(session, email: str):
+    cached = user_cache.get_by_email(email)
+    if cached:
+        return cached
     try:
-        query = """
+        query = named_query("find_by_email", """
         MATCH (u:User {email: $email})
         RETURN u
-        """
-        result = session.run(query, email=email)
-        user_data = result.single()
+        """)
+        user_data = await session.execute_read(fetch_single, query, email=email)
         
         if user_data:
-            user = user_data["u"]
-            return {
-                "id": user["id"],
-                "name": user["name"],
-                "email": user["email"],
-                "school_year": user["school_year"],
-                "num_of_connections": user["num_of_connections"],
-                "invited_by": user.get("invited_by")
-            }
+            user = user_to_dict(user_data["u"])
+            user_cache.put(user)
+            return user
         return None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-from pydantic import BaseModel, EmailStr
-
-# Request model for connecting users by email
-class ConnectionByEmailRequest(BaseModel):
-    email1: EmailStr
-    email2: EmailStr
-
 @app.post("/connect_users_by_email")
 async def connect_users_by_email(connection_request: ConnectionByEmailRequest, session=Depends(get_neo4j_session)):
     try:
-        # Find the first user by email
-        user1_data = find_by_email(session, connection_request.email1)
-        if not user1_data:
-            raise HTTPException(status_code=404, detail="User with email1 not found")
-
-        # Find the second user by email
-        user2_data = find_by_email(session, connection_request.email2)
-        if not user2_data:
-            raise HTTPException(status_code=404, detail="User with email2 not found")
-
-        # Create a bidirectional connection between the two users
-        session.run("""
-            MATCH (u1:User {id: $user1_id}), (u2:User {id: $user2_id})
-            MERGE (u1)-[:CONNECTED_TO]->(u2)
-            MERGE (u2)-[:CONNECTED_TO]->(u1)
-        """, user1_id=str(user1_data["id"]), user2_id=str(user2_data["id"]))
-
-        # Increment connection counts for both users
-        increment_connections(UUID(user1_data["id"]), session)
-
-        return {"message": "Connection created successfully between users"}
+        if connection_request.email1 == connection_request.email2:
+            raise HTTPException(status_code=400, detail="Cannot connect a user to themselves")
+
+        connection = await connect_by(session, "email", connection_request.email1, connection_request.email2)
+        if not connection:
+            raise HTTPException(status_code=404, detail="One or both users not found")
+
+        return connection_response(connection, "Connection created successfully between users")
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -142,149 +361,353 @@ async def connect_users_by_email(connection_request: ConnectionByEmailRequest, s
 
 @app.get("/users/email/{email}")
 async def get_user_by_email(email: str, session=Depends(get_neo4j_session)):
-    user = find_by_email(session, email)
+    user = await find_by_email(session, email)
     if user:
         return user
     raise HTTPException(status_code=404, detail="User not found")
 
+# Connections page sizes
+DEFAULT_CONNECTIONS_PAGE_SIZE = 100
+MAX_CONNECTIONS_PAGE_SIZE = 1000
+
+# Only the fields the API returns are projected, and only one direction of the
+# CONNECTED_TO pair is walked (connections are always written both ways)
+CONNECTED_USER_PROJECTION = "c { .id, .name, .email, .school_year, .num_of_connections, .invited_by }"
+
+# One page of a user's connections, looked up by "email" or "id". Keyset pagination
+# on the connected user's id; the user lookup is folded into the same query.
+# Returns (user id, connections, next cursor), or None when the user does not exist.
+async def connections_page(session, key: str, value: str, cursor: Optional[str], limit: int):
+    query = named_query("connections_page" if key == "email" else f"connections_page_by_{key}", f"""
+    MATCH (u:User {{{key}: $value}})
+    OPTIONAL MATCH (u)-[:CONNECTED_TO]->(c:User)
+    WHERE $cursor IS NULL OR c.id > $cursor
+    WITH u, c ORDER BY c.id LIMIT $limit
+    RETURN u.id AS user_id,
+           CASE WHEN c IS NULL THEN null ELSE {CONNECTED_USER_PROJECTION} END AS connected_user
+    """)
+    records = await session.execute_read(fetch_all, query, value=value, cursor=cursor, limit=limit + 1)
+    if not records:
+        return None
+
+    connections = [record["connected_user"] for record in records if record["connected_user"] is not None]
+    next_cursor = None
+    if len(connections) > limit:
+        connections = connections[:limit]
+        next_cursor = connections[-1]["id"]
+    return records[0]["user_id"], connections, next_cursor
+
+# Supports If-None-Match: a repeat request for an unchanged page is answered
+# with 304 (or the cached body) without querying Neo4j
 @app.get("/users/{email}/connections")
-async def get_user_connections(email: str, session=Depends(get_neo4j_session)):
+async def get_user_connections(
+    request: Request,
+    email: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_CONNECTIONS_PAGE_SIZE, ge=1, le=MAX_CONNECTIONS_PAGE_SIZE),
+    session=Depends(get_neo4j_session)
+):
     try:
-        # Find the user by email
-        user_data = find_by_email(session, email)
-        if not user_data:
-            raise HTTPException(status_code=404, detail="User not found")
+        seq_before = versions.seq
+        cached_user = user_cache.get_by_email(email)
+        user_id = versions.user_for_email(email) or (cached_user["id"] if cached_user else None)
+        if user_id is not None:
+            version = versions.graph_version(user_id)
+            hit = cached_response(request, versions.etag("connections", version, user_id, cursor, limit), version)
+            if hit is not None:
+                return hit
 
-        # Retrieve all connected users
-        query = """
-        MATCH (u:User {email: $email})-[:CONNECTED_TO]-(connected_user:User)
-        RETURN DISTINCT connected_user
-        """
-        result = session.run(query, email=email)
-        
-        # Collect connections
-        connections = [
-            {
-                "id": record["connected_user"]["id"],
-                "name": record["connected_user"]["name"],
-                "email": record["connected_user"]["email"],
-                "school_year": record["connected_user"]["school_year"],
-                "num_of_connections": record["connected_user"]["num_of_connections"],
-                "invited_by": record["connected_user"].get("invited_by")
-            }
-            for record in result
-        ]
+        page = await connections_page(session, "email", email, cursor, limit)
+        if page is None:
+            raise HTTPException(status_code=404, detail="User not found")
 
-        return {"connections": connections}
+        user_id, connections, next_cursor = page
+        versions.learn_email(email, user_id)
+        version = versions.graph_version(user_id)
+        return versioned_response(
+            {"connections": connections, "next_cursor": next_cursor},
+            versions.etag("connections", version, user_id, cursor, limit), version, seq_before
+        )
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-def find_by_uuid(session, user_id: uuid.UUID):
+# NDJSON variant: records are written out as the driver produces them,
+# so memory stays flat however many connections the user has
+@app.get("/users/{email}/connections/stream")
+async def stream_user_connections(email: str):
+    async with gated_session(gates["cheap"]) as session:
+        user_data = await find_by_email(session, email)
+    if not user_data:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    query = f"""
+    MATCH (u:User {{email: $email}})-[:CONNECTED_TO]->(c:User)
+    RETURN {CONNECTED_USER_PROJECTION} AS connected_user
+    """
+
+    admit_stream(gates["cheap"])
+    async def stream_connections():
+        async with gated_session(gates["cheap"]) as stream_session:
+            result = await stream_session.run(query, email=email)
+            async for record in result:
+                yield json.dumps(record["connected_user"]) + "\n"
+
+    return StreamingResponse(stream_connections(), media_type="application/x-ndjson")
+
+async def find_by_uuid(session, user_id: uuid.UUID):
+    cached = user_cache.get_by_id(user_id)
+    if cached:
+        return cached
     try:
-        query = """
+        query = named_query("find_by_uuid", """
         MATCH (u:User {id: $user_id})
         RETURN u
-        """
-        result = session.run(query, user_id=str(user_id))
-        user_data = result.single()
+        """)
+        user_data = await session.execute_read(fetch_single, query, user_id=str(user_id))
         
         if user_data:
-            user = user_data["u"]
-            return {
-                "id": user["id"],
-                "name": user["name"],
-                "email": user["email"],
-                "school_year": user["school_year"],
-                "num_of_connections": user["num_of_connections"],
-                "invited_by": user.get("invited_by")
-            }
+            user = user_to_dict(user_data["u"])
+            user_cache.put(user)
+            return user
         return None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-def find_by_name(session, name: str):
-    try:
-        query = """
-        MATCH (u:User {name: $name})
-        RETURN u
-        """
-        result = session.run(query, name=name)
-        user_data = result.single()
-        
-        if user_data:
-            user = user_data["u"]
-            return {
-                "id": user["id"],
-                "name": user["name"],
-                "email": user["email"],
-                "school_year": user["school_year"],
-                "num_of_connections": user["num_of_connections"],
-                "invited_by": user.get("invited_by")
-            }
+# Keep in-process state in step with a new connection written to the database:
+# both users' cached records carry a stale num_of_connections
+def record_connection(user1_id, user2_id):
+    user_cache.invalidate(user_id=user1_id)
+    user_cache.invalidate(user_id=user2_id)
+    # The pair's connection lists change, and a new edge can bring posts into
+    # anyone's visibility radius
+    versions.bump_graph(user1_id, user2_id)
+    versions.bump_all_feeds()
+    if components is not None:
+        components.union(str(user1_id), str(user2_id))
+    if graph_index is not None:
+        graph_index.add_edge(str(user1_id), str(user2_id))
+        # Their connections' pages show the pair's num_of_connections
+        versions.bump_graph(*graph_index.neighbor_ids(str(user1_id)), *graph_index.neighbor_ids(str(user2_id)))
+    if suggestion_index is not None:
+        suggestion_index.add_edge(graph_index, str(user1_id), str(user2_id))
+    if distance_oracle is not None:
+        distance_oracle.add_edge()
+        if distance_oracle.rebuild_due and not distance_oracle.building:
+            start_background(distance_oracle.rebuild(graph_index))
+
+# Resolve both users, merge the edge pair and bump both counters only when the
+# edge is new, all in one statement. The first SET takes write locks on both users,
+# so concurrent or retried connects of the same pair serialise on the existence check
+# instead of double counting. {key} is one of CONNECT_KEYS.
+CONNECT_USERS_QUERY = """
+MATCH (u1:User {{{key}: $user1}})
+WITH u1 LIMIT 1
+MATCH (u2:User {{{key}: $user2}})
+WITH u1, u2 LIMIT 1
+SET u1.num_of_connections = coalesce(u1.num_of_connections, 0),
+    u2.num_of_connections = coalesce(u2.num_of_connections, 0)
+WITH u1, u2, EXISTS {{ (u1)-[:CONNECTED_TO]->(u2) }} AS already_connected
+MERGE (u1)-[:CONNECTED_TO]->(u2)
+MERGE (u2)-[:CONNECTED_TO]->(u1)
+FOREACH (_ IN CASE WHEN already_connected THEN [] ELSE [1] END |
+    SET u1.num_of_connections = u1.num_of_connections + 1,
+        u2.num_of_connections = u2.num_of_connections + 1
+)
+RETURN u1.id AS user1_id, u1.email AS user1_email,
+       u2.id AS user2_id, u2.email AS user2_email,
+       NOT already_connected AS created
+"""
+# Names are not unique, so connects by name go through CONNECT_USERS_BY_NAME_QUERY
+CONNECT_KEYS = ("id", "email")
+
+def connect_users_query(key: str):
+    return named_query(f"connect_users_by_{key}", CONNECT_USERS_QUERY.format(key=key))
+
+async def write_connection(session, key: str, user1: str, user2: str) -> Optional[dict]:
+    record = await session.execute_write(
+        fetch_single, connect_users_query(key), user1=user1, user2=user2
+    )
+    return record.data() if record else None
+
+# Connect two users looked up by id or email in a single write transaction
+# (batched with concurrent connects when the write queue is on).
+# Returns None when either user does not exist.
+async def connect_by(session, key: str, user1: str, user2: str) -> Optional[dict]:
+    if key not in CONNECT_KEYS:
+        raise ValueError(f"Cannot connect users by {key}")
+    if write_queues is not None:
+        connection = await write_queues[f"connect_by_{key}"].submit({"user1": user1, "user2": user2})
+    else:
+        connection = await write_connection(session, key, user1, user2)
+    if not connection:
         return None
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if connection["created"]:
+        record_connection(connection["user1_id"], connection["user2_id"])
+    return connection
 
-def increment_connections(user_id: UUID, session) -> dict:
-    try:
-        query = """
-        MATCH (u:User {id: $user_id})
-        SET u.num_of_connections = coalesce(u.num_of_connections, 0) + 1
-        RETURN u.num_of_connections AS num_of_connections
-        """
-        
-        result = session.run(query, user_id=str(user_id))
-        updated_data = result.single()
-        
-        if updated_data:
-            return {
-                "message": "User's connection count updated successfully",
-                "num_of_connections": updated_data["num_of_connections"]
-            }
-        return {"message": "User not found or could not update connections"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to increment connections: {str(e)}")
+# CONNECT_USERS_QUERY for names, with the ambiguity check in the same statement:
+# when either name matches several users nothing is written and those names come
+# back in ambiguous. Always returns one row; user1_id is null when nothing was
+# connected. Unlike the id/email queries it is never batched.
+CONNECT_USERS_BY_NAME_QUERY = named_query("connect_users_by_name", """
+OPTIONAL MATCH (a:User {name: $user1})
+WITH collect(a)[..2] AS first
+OPTIONAL MATCH (b:User {name: $user2})
+WITH first, collect(b)[..2] AS second
+WITH [name IN [CASE WHEN size(first) > 1 THEN $user1 END, CASE WHEN size(second) > 1 THEN $user2 END]
+      WHERE name IS NOT NULL] AS ambiguous,
+     CASE WHEN size(first) = 1 AND size(second) = 1 THEN first[0] END AS u1,
+     CASE WHEN size(first) = 1 AND size(second) = 1 THEN second[0] END AS u2
+FOREACH (_ IN CASE WHEN u1 IS NULL THEN [] ELSE [1] END |
+    SET u1.num_of_connections = coalesce(u1.num_of_connections, 0),
+        u2.num_of_connections = coalesce(u2.num_of_connections, 0)
+)
+WITH ambiguous, u1, u2,
+     CASE WHEN u1 IS NULL THEN true ELSE EXISTS { (u1)-[:CONNECTED_TO]->(u2) } END AS already_connected
+FOREACH (_ IN CASE WHEN u1 IS NULL THEN [] ELSE [1] END |
+    MERGE (u1)-[:CONNECTED_TO]->(u2)
+    MERGE (u2)-[:CONNECTED_TO]->(u1)
+)
+FOREACH (_ IN CASE WHEN already_connected THEN [] ELSE [1] END |
+    SET u1.num_of_connections = u1.num_of_connections + 1,
+        u2.num_of_connections = u2.num_of_connections + 1
+)
+RETURN ambiguous,
+       u1.id AS user1_id, u1.email AS user1_email,
+       u2.id AS user2_id, u2.email AS user2_email,
+       NOT already_connected AS created
+""")
+
+# Connect two users by name; 409 when a name matches more than one user,
+# None when either does not exist
+async def connect_by_name(session, name1: str, name2: str) -> Optional[dict]:
+    record = await session.execute_write(fetch_single, CONNECT_USERS_BY_NAME_QUERY, user1=name1, user2=name2)
+    connection = record.data()
+    if connection["ambiguous"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Several users share the name(s) {', '.join(connection['ambiguous'])}; connect by email or id instead"
+        )
+    if connection["user1_id"] is None:
+        return None
+    if connection["created"]:
+        record_connection(connection["user1_id"], connection["user2_id"])
+    return connection
+
+def connection_response(connection: dict, message: str) -> dict:
+    if not connection["created"]:
+        message = "Users are already connected"
+    return {"message": message, "created": connection["created"]}
+
+CREATE_USER_QUERY = named_query("create_user", """
+CREATE (u:User {
+    id: $id,
+    name: $name,
+    email: $email,
+    school_year: $school_year,
+    num_of_connections: $num_of_connections,
+    invited_by: $invited_by
+})
+RETURN u
+""")
+
+# Managed transaction work for create_user_and_connect
+async def create_user_and_connect_tx(tx, existing_user_id: str, **user_params):
+    new_user_data = await fetch_single(tx, CREATE_USER_QUERY, **user_params)
+    connection = await fetch_single(
+        tx, connect_users_query("id"), user1=existing_user_id, user2=user_params["id"]
+    )
+    if not connection:
+        # Raising rolls back the user created above
+        raise HTTPException(status_code=404, detail="Existing user not found")
+    return new_user_data, connection.data()
+
+# Single-item write for create_user_and_connect; returns the new User node
+async def write_user_and_connection(session, params: dict):
+    new_user_data, _ = await session.execute_write(create_user_and_connect_tx, **params)
+    return new_user_data["u"] if new_user_data else None
 
 # Endpoints
 
-# Health check endpoint
+# Health check endpoint (process is up; does not touch the database)
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+# Liveness probe: the event loop is responsive
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "alive"}
+
+# Readiness probe: startup work is done, the database answers within
+# READINESS_TIMEOUT_SECONDS and the pool is not saturated. 503 when not ready.
+@app.get("/health/ready")
+async def readiness_check():
+    checks = {
+        "driver": driver is not None,
+        "startup_complete": startup_state["complete"],
+    }
+    details = {
+        "sessions_in_use": metrics.sessions_in_use,
+        "max_pool_size": NEO_MAX_POOL_SIZE,
+        "pool_config": pool_config(),
+    }
+    if startup_state["error"]:
+        details["startup_error"] = startup_state["error"]
+
+    if driver is not None:
+        error = await check_database(driver, READINESS_TIMEOUT_SECONDS)
+        checks["database"] = error is None
+        if error:
+            details["database_error"] = error
+    # Every pooled connection is held by a request session
+    checks["pool_available"] = metrics.sessions_in_use < NEO_MAX_POOL_SIZE
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks, **details}
+    )
+
+# Report which constraints and indexes are present
+@app.get("/admin/schema")
+async def get_schema():
+    try:
+        return await describe_schema(driver)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read schema: {str(e)}")
+
+# Report user cache hit/miss/eviction counters
+@app.get("/admin/user_cache")
+async def get_user_cache_stats():
+    return user_cache.stats()
+
+# Prometheus scrape endpoint: query latency/rows/db hits, per-route round trips,
+# session usage and acquisition wait
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Report graph index size, memory footprint and staleness
+@app.get("/admin/graph_index")
+async def get_graph_index_stats():
+    if graph_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **graph_index.stats()}
+
 # User Management Endpoints
 @app.post("/users", response_model=dict)
 async def create_user(user: User, session=Depends(get_neo4j_session)):
     try:
-        # Check if user with same email already exists
-        existing_user = session.run(
-            "MATCH (u:User {email: $email}) RETURN u",
-            email=user.email
-        ).single()
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=400,
-                detail="User with this email already exists"
-            )
-
-        query = """
-        CREATE (u:User {
-            id: $id,
-            name: $name,
-            email: $email,
-            school_year: $school_year,
-            num_of_connections: $num_of_connections,
-            invited_by: $invited_by
-        })
-        RETURN u
-        """
-        
-        result = session.run(
-            query,
+        # Duplicate emails are rejected by the user_email_unique constraint
+        created_user = await session.execute_write(
+            fetch_single,
+            CREATE_USER_QUERY,
             id=str(user.id),
             name=user.name,
             email=user.email,
@@ -293,14 +716,27 @@ async def create_user(user: User, session=Depends(get_neo4j_session)):
             invited_by=str(user.invited_by) if user.invited_by else None
         )
         
-        created_user = result.single()
-        
         if not created_user:
             raise HTTPException(status_code=500, detail="Failed to create user")
             
         user_dict = dict(created_user["u"])
+        user_cache.invalidate(user_id=user_dict["id"], email=user_dict["email"])
+        versions.bump_graph(user_dict["id"])
+        if graph_index is not None:
+            graph_index.add_user(user_dict["id"])
+        if components is not None:
+            components.add_user(user_dict["id"])
+        if suggestion_index is not None:
+            suggestion_index.add_user(user_dict["id"], user_dict["school_year"])
+        if user_search is not None:
+            user_search.add(user_dict["id"], user_dict["name"], user_dict["email"])
         return {"message": "User created successfully", "user": user_dict}
 
+    except ConstraintError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=duplicate_user_detail(e)
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -309,42 +745,252 @@ async def create_user(user: User, session=Depends(get_neo4j_session)):
             detail=f"An error occurred while creating the user: {str(e)}"
         )
 
+# Which uniqueness constraint a user write broke, from the constraint name or the
+# "already exists with label `User` and property `id`" message Neo4j reports
+def duplicate_user_detail(error: ConstraintError) -> str:
+    message = error.message or ""
+    if "user_id_unique" in message or "property `id`" in message:
+        return "User with this id already exists"
+    return "User with this email already exists"
+
+# Resolve many users by id and/or email with one query, serving what we can from the cache.
+# Returns the users keyed by id plus the ids and emails that had to be read from the database.
+async def resolve_users(session, ids: List[str], emails: List[str]):
+    users = {}
+    missing_ids = []
+    for user_id in dict.fromkeys(ids):
+        cached = user_cache.get_by_id(user_id)
+        if cached:
+            users[user_id] = cached
+        else:
+            missing_ids.append(user_id)
+    missing_emails = []
+    for email in dict.fromkeys(emails):
+        cached = user_cache.get_by_email(email)
+        if cached:
+            users[cached["id"]] = cached
+        else:
+            missing_emails.append(email)
+
+    if missing_ids or missing_emails:
+        query = named_query("users_batch", """
+        UNWIND $ids AS user_id
+        MATCH (u:User {id: user_id})
+        RETURN u
+        UNION
+        UNWIND $emails AS email
+        MATCH (u:User {email: email})
+        RETURN u
+        """)
+        records = await session.execute_read(fetch_all, query, ids=missing_ids, emails=missing_emails)
+        for record in records:
+            user = user_to_dict(record["u"])
+            user_cache.put(user)
+            users[user["id"]] = user
+    return users, missing_ids, missing_emails
+
+@app.post("/users/batch")
+async def get_users_batch(batch_request: UserBatchRequest, session=Depends(get_neo4j_session)):
+    try:
+        users, missing_ids, missing_emails = await resolve_users(
+            session, [str(user_id) for user_id in batch_request.ids], batch_request.emails
+        )
+
+        found_emails = {user["email"] for user in users.values()}
+        return {
+            "users": list(users.values()),
+            "not_found": {
+                "ids": [user_id for user_id in missing_ids if user_id not in users],
+                "emails": [email for email in missing_emails if email not in found_emails]
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to resolve users: {str(e)}")
+
+# Search page sizes
+DEFAULT_SEARCH_RESULTS = 10
+MAX_SEARCH_RESULTS = 50
+# Separation is only looked up this far out when ranking search results by it
+SEARCH_SEPARATION_DEPTH = 3
+
+# Fallback when no in-process search index is loaded
+USER_SEARCH_QUERY = named_query("user_search", """
+CALL db.index.fulltext.queryNodes("user_search", $query) YIELD node, score
+RETURN node.id AS id, node.name AS name, node.email AS email
+ORDER BY score DESC
+LIMIT $limit
+""")
+
+# The targets that may be reachable from a viewer: all of them unless the
+# component tracker knows a target is in another component
+def reachable_targets(viewer_id, user_ids: List[str]) -> set:
+    if components is None:
+        return set(user_ids)
+    return {user_id for user_id in user_ids if components.connected(str(viewer_id), user_id) is not False}
+
+# Hop distance from a viewer to each of the given users (None past the search radius)
+async def separation_from(session, viewer_id: uuid.UUID, user_ids: List[str]) -> dict:
+    reachable = reachable_targets(viewer_id, user_ids)
+    if not reachable:
+        return {user_id: None for user_id in user_ids}
+    if distance_oracle is not None and distance_oracle.usable(graph_index):
+        results = distance_oracle.distances_from(graph_index, str(viewer_id), [user_id for user_id in user_ids if user_id in reachable])
+        found = {result["id"]: result["distance"] for result in results}
+        return {user_id: found.get(user_id) for user_id in user_ids}
+    distances = await neighborhood_distances(session, viewer_id, SEARCH_SEPARATION_DEPTH, SEPARATION_NODE_BUDGET)
+    return {user_id: distances.get(user_id) if user_id in reachable else None for user_id in user_ids}
+
+# Typeahead search on name and email: exact, prefix, word-prefix and then fuzzy
+# matches. With viewer_id, closer users rank first within each match type.
+# Declared before /users/{user_id} so "search" is not parsed as an id.
+@app.get("/users/search")
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(DEFAULT_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS),
+    cursor: Optional[str] = None,
+    viewer_id: Optional[uuid.UUID] = None,
+    session=Depends(get_neo4j_session)
+):
+    try:
+        if user_search is not None and user_search.ready:
+            candidates = user_search.candidates(q)
+            source = "index"
+        else:
+            lucene_query = fulltext_query(q)
+            records = []
+            if lucene_query:
+                records = await session.execute_read(
+                    fetch_all, USER_SEARCH_QUERY, query=lucene_query, limit=SEARCH_MAX_CANDIDATES
+                )
+            candidates = []
+            for record in records:
+                tier, score = classify(normalize(q), normalize(record["name"]), normalize(record["email"]))
+                candidates.append({
+                    "id": record["id"], "name": record["name"], "email": record["email"],
+                    "tier": tier, "similarity": score
+                })
+            source = "fulltext"
+
+        distances = None
+        if viewer_id is not None:
+            distances = await separation_from(session, viewer_id, [candidate["id"] for candidate in candidates])
+
+        results, next_cursor = rank_page(candidates, limit, cursor, distances)
+        return {"results": results, "next_cursor": next_cursor, "source": source}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+# Report search index size
+@app.get("/admin/user_search")
+async def get_user_search_stats():
+    if user_search is None:
+        return {"enabled": False}
+    return {"enabled": True, **user_search.stats()}
+
 @app.get("/users/{user_id}")
 async def get_user(user_id: uuid.UUID, session=Depends(get_neo4j_session)):
-    user = find_by_uuid(session, user_id)
+    user = await find_by_uuid(session, user_id)
     if user:
         return user
     raise HTTPException(status_code=404, detail="User not found")
 
+# ----------------------- SUGGESTIONS -----------------------------------
+
+DEFAULT_SUGGESTIONS = 10
+
+# Fallback when no suggestion index is loaded: two-hop aggregation for this one user
+SUGGESTIONS_QUERY = named_query("suggestions", """
+MATCH (u:User {id: $user_id})-[:CONNECTED_TO]->(:User)-[:CONNECTED_TO]->(c:User)
+WHERE c <> u AND NOT EXISTS { (u)-[:CONNECTED_TO]->(c) }
+WITH u, c, count(*) AS mutual
+RETURN c.id AS id, mutual
+ORDER BY mutual DESC,
+         CASE WHEN u.school_year IS NULL OR c.school_year IS NULL THEN 100
+              ELSE abs(u.school_year - c.school_year) END,
+         c.id
+LIMIT $limit
+""")
+
+# "People you may know": users not yet connected, ranked by mutual connections
+# and then by school_year proximity. Served from the precomputed lists when enabled.
+@app.get("/users/{user_id}/suggestions")
+async def get_suggestions(
+    user_id: uuid.UUID,
+    limit: int = Query(DEFAULT_SUGGESTIONS, ge=1, le=100),
+    session=Depends(get_neo4j_session)
+):
+    try:
+        user = await find_by_uuid(session, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        if suggestion_index is not None and suggestion_index.ready:
+            ranked = suggestion_index.suggestions(str(user_id), limit)
+            source = "index"
+        else:
+            records = await session.execute_read(fetch_all, SUGGESTIONS_QUERY, user_id=str(user_id), limit=limit)
+            ranked = [(record["id"], record["mutual"]) for record in records]
+            source = "query"
+
+        users, _, _ = await resolve_users(session, [candidate_id for candidate_id, _ in ranked], [])
+        return {
+            "suggestions": [
+                {"user": users[candidate_id], "mutual_connections": mutual}
+                for candidate_id, mutual in ranked if candidate_id in users
+            ],
+            "source": source
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load suggestions: {str(e)}")
+
+# Report conditional GET cache usage
+@app.get("/admin/response_cache")
+async def get_response_cache_stats():
+    return {**response_cache.stats(), "version_seq": versions.seq}
+
+# Report write queue depth, batch sizes and throughput
+@app.get("/admin/write_queue")
+async def get_write_queue_stats():
+    if write_queues is None:
+        return {"enabled": False}
+    return {"enabled": True, "queues": {name: queue.stats() for name, queue in write_queues.items()}}
+
+# Report admission gate load, shed requests and query timeouts
+@app.get("/admin/admission")
+async def get_admission_stats():
+    return {
+        "gates": {name: gate.stats() for name, gate in gates.items()},
+        "route_query_timeout_seconds": ROUTE_QUERY_TIMEOUT_SECONDS,
+        "feed_degraded": {"enabled": FEED_DEGRADED_ENABLED, "depth": DEGRADED_FEED_DEPTH},
+    }
+
+# Report suggestion list coverage and patch counters
+@app.get("/admin/suggestions")
+async def get_suggestion_stats():
+    if suggestion_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **suggestion_index.stats()}
+
 # Connection Management Endpoints
 @app.post("/connect_users")
 async def connect_users(connection_request: ConnectionRequest, session=Depends(get_neo4j_session)):
     try:
-        user1_exists = session.run(
-            "MATCH (u:User {id: $user1_id}) RETURN u",
-            user1_id=str(connection_request.user1)
-        ).single()
-        
-        user2_exists = session.run(
-            "MATCH (u:User {id: $user2_id}) RETURN u",
-            user2_id=str(connection_request.user2)
-        ).single()
-        
-        if not user1_exists or not user2_exists:
-            raise HTTPException(status_code=404, detail="One or both users not found")
-
-        # Create bidirectional connection
-        session.run("""
-            MATCH (u1:User {id: $user1_id}), (u2:User {id: $user2_id})
-            MERGE (u1)-[:CONNECTED_TO]->(u2)
-            MERGE (u2)-[:CONNECTED_TO]->(u1)
-        """, user1_id=str(connection_request.user1), user2_id=str(connection_request.user2))
+        if connection_request.user1 == connection_request.user2:
+            raise HTTPException(status_code=400, detail="Cannot connect a user to themselves")
 
-        # Increment connection counts
-        increment_connections(connection_request.user1, session)
-        increment_connections(connection_request.user2, session)
+        connection = await connect_by(session, "id", str(connection_request.user1), str(connection_request.user2))
+        if not connection:
+            raise HTTPException(status_code=404, detail="One or both users not found")
 
-        return {"message": "Connection created successfully"}
+        return connection_response(connection, "Connection created successfully")
     except HTTPException:
         raise
     except Exception as e:
@@ -356,24 +1002,15 @@ async def connect_users(connection_request: ConnectionRequest, session=Depends(g
 @app.post("/connect_users_by_name")
 async def connect_users_by_name(connection_request: ConnectionByNameRequest, session=Depends(get_neo4j_session)):
     try:
-        user1_data = find_by_name(session, connection_request.name1)
-        user2_data = find_by_name(session, connection_request.name2)
+        if connection_request.name1 == connection_request.name2:
+            raise HTTPException(status_code=400, detail="Cannot connect a user to themselves")
 
-        if not user1_data or not user2_data:
+        # Names that match more than one user are refused (409) rather than connecting an arbitrary one
+        connection = await connect_by_name(session, connection_request.name1, connection_request.name2)
+        if not connection:
             raise HTTPException(status_code=404, detail="One or both users not found")
 
-        # Create bidirectional connection
-        session.run("""
-            MATCH (u1:User {id: $user1_id}), (u2:User {id: $user2_id})
-            MERGE (u1)-[:CONNECTED_TO]->(u2)
-            MERGE (u2)-[:CONNECTED_TO]->(u1)
-        """, user1_id=str(user1_data["id"]), user2_id=str(user2_data["id"]))
-
-        # Increment connection counts
-        increment_connections(UUID(user1_data["id"]), session)
-        increment_connections(UUID(user2_data["id"]), session)
-
-        return {"message": "Connection created successfully between users"}
+        return connection_response(connection, "Connection created successfully between users")
     except HTTPException:
         raise
     except Exception as e:
@@ -385,139 +1022,608 @@ async def connect_users_by_name(connection_request: ConnectionByNameRequest, ses
 @app.post("/create_user_and_connect")
 async def create_user_and_connect(user: User, existing_user_id: UUID, session=Depends(get_neo4j_session)):
     try:
-        # First create the new user
-        create_user_query = """
-        CREATE (new_user:User {
-            id: $id,
-            name: $name,
-            email: $email,
-            school_year: $school_year,
-            num_of_connections: $num_of_connections,
-            invited_by: $invited_by
-        })
-        RETURN new_user
-        """
-        
-        result = session.run(
-            create_user_query,
-            id=str(user.id),
-            name=user.name,
-            email=user.email,
-            school_year=user.school_year,
-            num_of_connections=user.num_of_connections,
-            invited_by=str(user.invited_by) if user.invited_by else None
-        )
-        
-        new_user_data = result.single()
+        # Create the new user and connect it in one write transaction,
+        # so a missing existing user leaves no orphaned account behind
+        params = {
+            "id": str(user.id),
+            "name": user.name,
+            "email": user.email,
+            "school_year": user.school_year,
+            "num_of_connections": user.num_of_connections,
+            "invited_by": str(user.invited_by) if user.invited_by else None,
+            "existing_user_id": str(existing_user_id)
+        }
+        if write_queues is not None:
+            new_user_data = await write_queues["create_user_and_connect"].submit(params)
+            if new_user_data is None:
+                raise HTTPException(status_code=404, detail="Existing user not found")
+        else:
+            new_user_data = await write_user_and_connection(session, params)
         if not new_user_data:
             raise HTTPException(status_code=500, detail="Failed to create the new user")
 
-        # Create connection between existing user and new user
-        connect_query = """
-        MATCH (existing_user:User {id: $existing_user_id}), (new_user:User {id: $new_user_id})
-        MERGE (existing_user)-[:CONNECTED_TO]->(new_user)
-        MERGE (new_user)-[:CONNECTED_TO]->(existing_user)
-        """
-        
-        session.run(
-            connect_query,
-            existing_user_id=str(existing_user_id),
-            new_user_id=str(user.id)
-        )
-        
-        # Increment connection counts for both users
-        increment_connections(existing_user_id, session)
-        increment_connections(user.id, session)
-
+        if suggestion_index is not None:
+            suggestion_index.add_user(str(user.id), user.school_year)
+        if user_search is not None:
+            user_search.add(str(user.id), user.name, user.email)
+        record_connection(existing_user_id, user.id)
         return {"message": "New user created and connected successfully"}
+    except ConstraintError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=duplicate_user_detail(e)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to create user and establish connection: {str(e)}"
         )
+# Bulk import endpoint: the request body is NDJSON or CSV (header row first),
+# streamed into Neo4j in batched UNWIND transactions. Same row layout as the
+# User, ConnectionRequest and Post models; reruns are idempotent.
+@app.post("/import/{kind}")
+async def bulk_import(
+    kind: str,
+    request: Request,
+    format: str = "ndjson",
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000)
+):
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown import kind: {kind}")
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown import format: {format}")
+
+    try:
+        report = await import_rows(driver, kind, stream_lines(request.stream()), format, batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+    # Imported rows bypass the per-write invalidation, so drop cached users
+    # and rebuild the in-process structures in the background
+    if report["rows_written"]:
+        user_cache.clear()
+        versions.bump_all()
+        # Feeds are read from the database until the timelines are rebuilt
+        if kind in ("posts", "connections") and timelines is not None:
+            timelines.invalidate()
+        start_background(refresh_after_import(kind, report))
+    return report
+
+# Reload what an import bypassed, in dependency order: feed audiences are
+# computed from the components and the graph index
+async def refresh_after_import(kind: str, report: dict):
+    steps = []
+    if kind == "users" and user_search is not None:
+        steps.append(("user search index", lambda: user_search.reload(driver)))
+    if kind in ("users", "connections") and components is not None:
+        steps.append(("components", lambda: components.reload(driver)))
+    if kind == "connections" and graph_index is not None and report["connections_created"]:
+        steps.append(("graph index", reload_graph_index))
+        if suggestion_index is not None:
+            steps.append(("suggestions", lambda: suggestion_index.rebuild(graph_index, driver)))
+    if kind in ("posts", "connections") and timelines is not None:
+        steps.append(("feed timelines", rebuild_timelines))
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as e:
+            print(f"Failed to refresh {name} after import: {str(e)}")
+
 # ----------------------- FEED -----------------------------------
 
-from datetime import datetime
-from typing import List
-from pydantic import BaseModel, Field
+CREATE_POST_QUERY = named_query("create_post", """
+MATCH (u:User {id: $author_id})
+CREATE (p:Post {
+    id: $post_id,
+    content: $content,
+    visibility_degree: $visibility_degree,
+    timestamp: $timestamp
+})-[:POSTED_BY]->(u)
+RETURN p
+""")
 
-# Post model
-class Post(BaseModel):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4)
-    content: str
-    author_id: uuid.UUID
-    visibility_degree: int
-    timestamp: datetime = Field(default_factory=datetime.now)
+# Single-item write for create_post; returns the new Post node
+async def write_post(session, params: dict):
+    post_data = await session.execute_write(fetch_single, CREATE_POST_QUERY, **params)
+    return post_data["p"] if post_data else None
 
 # Helper function to create a post
-def create_post(session, post: Post):
-    query = """
-    MATCH (u:User {id: $author_id})
-    CREATE (p:Post {
-        id: $post_id,
-        content: $content,
-        visibility_degree: $visibility_degree,
-        timestamp: $timestamp
-    })-[:POSTED_BY]->(u)
-    RETURN p
-    """
-    result = session.run(
-        query,
-        post_id=str(post.id),
-        content=post.content,
-        visibility_degree=post.visibility_degree,
-        timestamp=post.timestamp,
-        author_id=str(post.author_id)
-    )
-    post_data = result.single()
-    
-    if post_data:
-        return {"message": "Post created successfully", "post": post_data["p"]}
+async def create_post(session, post: Post):
+    params = {
+        "post_id": str(post.id),
+        "content": post.content,
+        "visibility_degree": post.visibility_degree,
+        "timestamp": post.timestamp,
+        "author_id": str(post.author_id)
+    }
+    if write_queues is not None:
+        post_node = await write_queues["posts"].submit(params)
+    else:
+        post_node = await write_post(session, params)
+
+    if post_node:
+        created_post = dict(post_node)
+        created_post["timestamp"] = to_native(created_post["timestamp"])
+        audience = None
+        if timelines is not None:
+            audience = await post_audience(session, post.author_id, post.visibility_degree)
+            timelines.fan_out(str(post.id), str(post.author_id), post.visibility_degree, post.timestamp, audience)
+        # Only the known audience's feeds change; otherwise assume any feed may
+        if audience is not None:
+            versions.bump_feeds(audience)
+        else:
+            versions.bump_all_feeds()
+        return {"message": "Post created successfully", "post": created_post}
     else:
         raise HTTPException(status_code=500, detail="Failed to create post")
 
 # Endpoint to create a post
 @app.post("/posts")
 async def create_post_endpoint(post: Post, session=Depends(get_neo4j_session)):
-    author = find_by_uuid(session, post.author_id)
+    author = await find_by_uuid(session, post.author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
     
-    return create_post(session, post)
-
-# Helper function to get feed posts based on visibility degree
-def get_feed_posts(session, user_id: uuid.UUID):
-    query = """
-    MATCH (p:Post)-[:POSTED_BY]->(author:User), (user:User {id: $user_id})
-    OPTIONAL MATCH path = shortestPath((author)-[:CONNECTED_TO*]-(user))
-    WITH p, author, user, length(path) AS degree
-    WHERE degree IS NOT NULL AND degree <= p.visibility_degree
-    RETURN p ORDER BY p.timestamp DESC
-    """
-    
-    result = session.run(query, user_id=str(user_id))
-    posts = [
-        {
-            "id": record["p"]["id"],
-            "content": record["p"]["content"],
-            "author_id": record["p"]["author_id"],
-            "visibility_degree": record["p"]["visibility_degree"],
-            "timestamp": record["p"]["timestamp"]
-        }
-        for record in result
-    ]
+    return await create_post(session, post)
+
+# Feed page sizes
+DEFAULT_FEED_PAGE_SIZE = 50
+MAX_FEED_PAGE_SIZE = 200
+
+# Helper function to find the largest visibility degree any post uses, capped at MAX_DEGREE
+async def get_max_visibility_degree(session) -> int:
+    query = named_query("max_visibility_degree", """
+    MATCH (p:Post)
+    WHERE p.visibility_degree IS NOT NULL
+    RETURN p.visibility_degree AS degree
+    ORDER BY degree DESC
+    LIMIT 1
+    """)
+    record = await session.execute_read(fetch_single, query)
+    if not record or record["degree"] is None:
+        return 0
+    return max(0, min(int(record["degree"]), MAX_DEGREE))
+
+# Hop distances from a user out to max_depth, from the graph index when it is loaded
+async def neighborhood_distances(session, user_id: uuid.UUID, max_depth: int, max_nodes: Optional[int] = None):
+    # Nobody else is reachable from a user alone in their component
+    component = components.component(str(user_id)) if components is not None else None
+    if component is not None and component[1] == 1:
+        return {str(user_id): 0}
+    if graph_index is not None and graph_index.ready:
+        return graph_index.k_hop(str(user_id), max_depth, max_nodes)
+    return await bfs_distances(session, user_id, max_depth, max_nodes)
+
+# Users who can see a post: everyone within its visibility degree of the author.
+# None when the audience is over the fan-out cap.
+async def post_audience(session, author_id, visibility_degree: int) -> Optional[List[str]]:
+    distances = await neighborhood_distances(session, author_id, visibility_degree, timelines.max_audience)
+    if len(distances) > timelines.max_audience:
+        return None
+    return list(distances)
+
+# Shape a Post node (plus its author's id) for API responses
+def post_to_dict(post, author_id: str) -> dict:
+    return {
+        "id": post["id"],
+        "content": post["content"],
+        "author_id": author_id,
+        "visibility_degree": post["visibility_degree"],
+        "timestamp": to_native(post["timestamp"])
+    }
+
+# Helper function to get feed posts based on visibility degree.
+# The viewer's neighborhood is expanded once (bounded by the widest visibility in use),
+# then only posts by reached authors whose visibility covers their distance are read.
+async def get_feed_posts(session, user_id: uuid.UUID, limit: int = DEFAULT_FEED_PAGE_SIZE, before: Optional[datetime] = None,
+                         before_id: Optional[str] = None, max_depth: int = MAX_DEGREE):
+    max_degree = min(await get_max_visibility_degree(session), max_depth)
+    distances = await neighborhood_distances(session, user_id, max_degree)
+    authors = [{"id": author_id, "degree": degree} for author_id, degree in distances.items()]
+
+    query = named_query("feed_posts", """
+    UNWIND $authors AS reached
+    MATCH (p:Post)-[:POSTED_BY]->(author:User {id: reached.id})
+    WHERE p.visibility_degree >= reached.degree
+      AND ($before IS NULL OR p.timestamp < $before
+           OR ($before_id IS NOT NULL AND p.timestamp = $before AND p.id < $before_id))
+    RETURN p, author.id AS author_id
+    ORDER BY p.timestamp DESC, p.id DESC
+    LIMIT $limit
+    """)
+
+    records = await session.execute_read(
+        fetch_all, query, authors=authors, before=before, before_id=before_id, limit=min(limit, MAX_FEED_PAGE_SIZE)
+    )
+    posts = [post_to_dict(record["p"], record["author_id"]) for record in records]
     return posts
 
+# Fan-out mode: read a slice of the user's materialized timeline, merged with
+# any wide (over the fan-out cap) posts whose author is within their visibility
+async def get_timeline_feed_posts(session, user_id: uuid.UUID, limit: int = DEFAULT_FEED_PAGE_SIZE, before: Optional[datetime] = None,
+                                  before_id: Optional[str] = None):
+    entries = timelines.read(str(user_id), limit, before, before_id)
+
+    wide_posts = timelines.read_wide(timelines.max_posts, before, before_id)
+    if wide_posts:
+        max_degree = min(max(entry[3] for entry in wide_posts), MAX_DEGREE)
+        distances = await neighborhood_distances(session, user_id, max_degree)
+        entries += [
+            (key, post_id) for key, post_id, author_id, visibility_degree in wide_posts
+            if author_id in distances and distances[author_id] <= visibility_degree
+        ]
+    entries = sorted(entries, reverse=True)[:limit]
+    if not entries:
+        return []
+
+    query = named_query("timeline_posts", """
+    UNWIND $ids AS post_id
+    MATCH (p:Post {id: post_id})-[:POSTED_BY]->(author:User)
+    RETURN p, author.id AS author_id
+    """)
+    records = await session.execute_read(fetch_all, query, ids=[post_id for _, post_id in entries])
+    posts = {record["p"]["id"]: post_to_dict(record["p"], record["author_id"]) for record in records}
+    return [posts[post_id] for _, post_id in entries if post_id in posts]
+
+# Recompute every feed timeline from the newest posts (after connections change who sees what)
+async def rebuild_timelines():
+    query = named_query("timeline_rebuild_posts", """
+    MATCH (p:Post)-[:POSTED_BY]->(author:User)
+    RETURN p.id AS id, author.id AS author_id, p.visibility_degree AS visibility_degree, p.timestamp AS timestamp
+    ORDER BY p.timestamp DESC
+    LIMIT $limit
+    """)
+    generation = timelines.generation
+    async with driver.session() as session:
+        records = await session.execute_read(fetch_all, query, limit=TIMELINE_REBUILD_POSTS)
+        posts = [{**record.data(), "timestamp": to_native(record["timestamp"])} for record in records]
+
+        async def audience_for(author_id, visibility_degree):
+            return await post_audience(session, author_id, visibility_degree)
+
+        await timelines.rebuild(posts, audience_for, generation)
+    # Posts from other workers or imports may have just become visible
+    versions.bump_all_feeds()
+
+# Feed page body. Pages are keyed on (timestamp, post id), newest first: pass
+# next_before and next_before_id back as ?before=&before_id= for the next page,
+# so posts sharing the boundary timestamp are neither skipped nor repeated.
+def feed_body(feed_posts: List[dict], limit: int) -> dict:
+    last = feed_posts[-1] if len(feed_posts) == limit else None
+    return {
+        "feed": feed_posts,
+        "next_before": last["timestamp"] if last else None,
+        "next_before_id": last["id"] if last else None,
+    }
+
+# One page of a user's feed, from the timelines when they are built and not
+# invalidated by an import since
+async def feed_page(session, user_id: uuid.UUID, limit: int, before: Optional[datetime],
+                    before_id: Optional[str] = None) -> dict:
+    if timelines is not None and timelines.ready:
+        feed_posts = await get_timeline_feed_posts(session, user_id, limit=limit, before=before, before_id=before_id)
+    else:
+        feed_posts = await get_feed_posts(session, user_id, limit=limit, before=before, before_id=before_id)
+    return feed_body(feed_posts, limit)
+
+# Feed served when the full one is shed or times out (FEED_DEGRADED_ENABLED): the
+# last body rendered for the same page if there is one, else the page computed
+# from only DEGRADED_FEED_DEPTH hops under the cheap gate. Never tagged or cached.
+async def degraded_feed(user_id: uuid.UUID, limit: int, before: Optional[datetime], before_id: Optional[str],
+                        key: str) -> Response:
+    headers = {"Cache-Control": "no-store"}
+    body = response_cache.get_latest(key)
+    if body is not None:
+        metrics.increment("feed_degraded_cached")
+        return Response(content=body, media_type="application/json", headers={**headers, "X-Feed-Degraded": "cached"})
+
+    metrics.increment("feed_degraded_depth")
+    async with gated_session(gates["cheap"]) as session:
+        feed_posts = await get_feed_posts(session, user_id, limit=limit, before=before, before_id=before_id,
+                                          max_depth=DEGRADED_FEED_DEPTH)
+    return JSONResponse(
+        content=jsonable_encoder(feed_body(feed_posts, limit)),
+        headers={**headers, "X-Feed-Degraded": f"depth={DEGRADED_FEED_DEPTH}"}
+    )
+
 # Endpoint to get the feed
+# Supports If-None-Match like the connections endpoint. The feed version moves
+# on posts that reach this user, on any new connection, and every FEED_VERSION_TTL_SECONDS.
+# Runs under the expensive gate; see degraded_feed for what happens when that is full.
 @app.get("/feed/{user_id}")
-async def get_feed(user_id: uuid.UUID, session=Depends(get_neo4j_session)):
-    # Ensure the requesting user exists
-    user = find_by_uuid(session, user_id)
+async def get_feed(
+    request: Request,
+    user_id: uuid.UUID,
+    limit: int = Query(DEFAULT_FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None
+):
+    seq_before = versions.seq
+    version = versions.feed_version(str(user_id))
+    etag = versions.etag("feed", version, user_id, limit, before.isoformat() if before else None, before_id)
+    hit = cached_response(request, etag, version)
+    if hit is not None:
+        return hit
+
+    key = f"feed-{user_id}-{limit}-{before.isoformat() if before else ''}-{before_id or ''}"
+    try:
+        async with gated_session(gates["expensive"], ROUTE_QUERY_TIMEOUT_SECONDS["feed"]) as session:
+            # Ensure the requesting user exists
+            user = await find_by_uuid(session, user_id)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            content = await feed_page(session, user_id, limit, before, before_id)
+    except (Overloaded, QueryTimeout):
+        if not FEED_DEGRADED_ENABLED:
+            raise
+        return await degraded_feed(user_id, limit, before, before_id, key)
+
+    return versioned_response(content, etag, versions.feed_version(str(user_id)), seq_before, key)
+
+# Report feed timeline sizes and fan-out counters
+@app.get("/admin/timelines")
+async def get_timeline_stats():
+    if timelines is None:
+        return {"enabled": False}
+    return {"enabled": True, **timelines.stats()}
+
+# Rebuild all feed timelines, e.g. after a wave of new connections
+@app.post("/admin/timelines/rebuild")
+async def rebuild_timelines_endpoint():
+    if timelines is None:
+        raise HTTPException(status_code=400, detail="Feed fan-out is not enabled")
+    try:
+        await rebuild_timelines()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild timelines: {str(e)}")
+    return {"enabled": True, **timelines.stats()}
+
+# ----------------------- DASHBOARD -----------------------------------
+
+DASHBOARD_SECTIONS = ("user", "connections", "feed")
+
+# Everything the dashboard page shows in one request: the user is resolved once,
+# then the connections and feed queries run concurrently, each on its own session
+# and its own expensive-gate slot (the lookup itself runs under the cheap gate).
+# ?include= picks sections (comma separated). A failed section comes back as null
+# with its error under "errors"; per-section timings are in "timings_ms" and the
+# Server-Timing header.
+@app.get("/dashboard/{email}")
+async def get_dashboard(
+    email: str,
+    include: str = ",".join(DASHBOARD_SECTIONS),
+    connections_limit: int = Query(DEFAULT_CONNECTIONS_PAGE_SIZE, ge=1, le=MAX_CONNECTIONS_PAGE_SIZE),
+    feed_limit: int = Query(DEFAULT_FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    session=Depends(get_neo4j_session)
+):
+    sections = [section.strip() for section in include.split(",") if section.strip()]
+    unknown = [section for section in sections if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    timings = {}
+    user = await find_by_email(session, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    feed_posts = get_feed_posts(session, user_id)
-    return {"feed": feed_posts}
+    versions.learn_email(email, user["id"])
+    timings["user"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def load_connections(section_session):
+        page = await connections_page(section_session, "id", user["id"], None, connections_limit)
+        _, connections, next_cursor = page or (None, [], None)
+        return {"connections": connections, "next_cursor": next_cursor}
+
+    async def load_feed(section_session):
+        return await feed_page(section_session, uuid.UUID(user["id"]), feed_limit, None)
+
+    async def timed(name, load):
+        section_started = time.perf_counter()
+        try:
+            async with gated_session(gates["expensive"], ROUTE_QUERY_TIMEOUT_SECONDS["dashboard"]) as section_session:
+                return await load(section_session)
+        finally:
+            timings[name] = round((time.perf_counter() - section_started) * 1000, 2)
+
+    loaders = {"connections": load_connections, "feed": load_feed}
+    names = [name for name in loaders if name in sections]
+    results = await asyncio.gather(*(timed(name, loaders[name]) for name in names), return_exceptions=True)
+
+    content = {"user": user} if "user" in sections else {}
+    errors = {}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            errors[name] = str(result) or type(result).__name__
+            result = None
+        content[name] = result
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    content["timings_ms"] = timings
+    if errors:
+        content["errors"] = errors
+
+    server_timing = ", ".join(f"{name};dur={duration}" for name, duration in timings.items())
+    return JSONResponse(content=jsonable_encoder(content), headers={"Server-Timing": server_timing})
+
+# ----------------------- SEPARATION -----------------------------------
+
+# Helper function to resolve the names along a path of user ids, keeping path order
+async def get_path_users(session, path: List[str]) -> List[dict]:
+    query = named_query("path_users", """
+    UNWIND $ids AS user_id
+    MATCH (u:User {id: user_id})
+    RETURN u.id AS id, u.name AS name
+    """)
+    records = await session.execute_read(fetch_all, query, ids=path)
+    names = {record["id"]: record["name"] for record in records}
+    return [{"id": user_id, "name": names.get(user_id)} for user_id in path]
+
+# Endpoint to get the degrees of separation between two users (capped at MAX_DEGREE hops)
+@app.get("/separation/{user_a}/{user_b}")
+async def get_separation(user_a: uuid.UUID, user_b: uuid.UUID, session=Depends(expensive_session("separation"))):
+    try:
+        if not await find_by_uuid(session, user_a) or not await find_by_uuid(session, user_b):
+            raise HTTPException(status_code=404, detail="One or both users not found")
+
+        if components is not None and components.connected(str(user_a), str(user_b)) is False:
+            path, budget_exhausted = None, False
+        elif graph_index is not None and graph_index.ready:
+            path, budget_exhausted = graph_index.shortest_path(str(user_a), str(user_b)), False
+        else:
+            path, budget_exhausted = await bidirectional_search(session, user_a, user_b)
+        if path is None:
+            return {
+                "degrees": None,
+                "separation": f"more than {MAX_DEGREE}",
+                "path": [],
+                "budget_exhausted": budget_exhausted
+            }
+
+        return {
+            "degrees": len(path) - 1,
+            "separation": str(len(path) - 1),
+            "path": await get_path_users(session, path),
+            "budget_exhausted": False
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute separation: {str(e)}")
+
+# Endpoint to get hop distances from one viewer to many users at once (e.g. for
+# "3rd-degree connection" badges). Distances past MAX_DEGREE come back as null.
+# Uses the landmark distance oracle when built, otherwise one bounded BFS from the viewer.
+@app.post("/distances")
+async def get_distances(distance_request: DistanceBatchRequest, session=Depends(expensive_session("distances"))):
+    try:
+        viewer_id = str(distance_request.viewer_id)
+        target_ids = list(dict.fromkeys(str(target_id) for target_id in distance_request.target_ids))
+        # Targets in another component are answered without a search
+        reachable = reachable_targets(viewer_id, target_ids)
+        unreachable = {"distance": None, "exact": True, "lower": None, "upper": None}
+        if not reachable:
+            results = [{"id": target_id, **unreachable} for target_id in target_ids]
+            return {"viewer_id": viewer_id, "distances": results, "source": "components"}
+
+        if distance_oracle is not None and distance_oracle.usable(graph_index):
+            found = distance_oracle.distances_from(graph_index, viewer_id, [target_id for target_id in target_ids if target_id in reachable])
+            found = {result["id"]: result for result in found}
+            results = [found.get(target_id) or {"id": target_id, **unreachable} for target_id in target_ids]
+            return {"viewer_id": viewer_id, "distances": results, "source": "oracle"}
+
+        distances = await neighborhood_distances(session, distance_request.viewer_id, MAX_DEGREE, SEPARATION_NODE_BUDGET)
+        # A BFS cut short by the node budget cannot rule out unreached targets
+        complete = len(distances) <= SEPARATION_NODE_BUDGET
+        results = [
+            {"id": target_id, "distance": distances.get(target_id),
+             "exact": target_id in distances or complete or target_id not in reachable, "lower": None, "upper": None}
+            for target_id in target_ids
+        ]
+        return {"viewer_id": viewer_id, "distances": results, "source": "bfs"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute distances: {str(e)}")
+
+# Report distance oracle size and staleness
+@app.get("/admin/distance_oracle")
+async def get_distance_oracle_stats():
+    if distance_oracle is None:
+        return {"enabled": False}
+    return {"enabled": True, **distance_oracle.stats()}
+
+# Rebuild the distance oracle from the current graph index
+@app.post("/admin/distance_oracle/rebuild")
+async def rebuild_distance_oracle():
+    if distance_oracle is None:
+        raise HTTPException(status_code=400, detail="Distance oracle is not enabled")
+    if not graph_index.ready:
+        raise HTTPException(status_code=503, detail="Graph index is not loaded yet")
+    try:
+        await distance_oracle.rebuild(graph_index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild distance oracle: {str(e)}")
+    return {"enabled": True, **distance_oracle.stats()}
+
+# Report connected components: count, largest components and a size histogram.
+# With ?user_id= also that user's component id and size.
+@app.get("/admin/components")
+async def get_component_stats(user_id: Optional[uuid.UUID] = None, largest: int = Query(10, ge=0, le=1000)):
+    if components is None:
+        return {"enabled": False}
+    report = {"enabled": True, **components.stats(largest)}
+    if user_id is not None:
+        component = components.component(str(user_id))
+        report["user"] = {
+            "id": str(user_id),
+            "component_id": component[0] if component else None,
+            "component_size": component[1] if component else None,
+        }
+    return report
+
+# Rescan users and connections into fresh components
+@app.post("/admin/components/rebuild")
+async def rebuild_components():
+    if components is None:
+        raise HTTPException(status_code=400, detail="Component tracking is not enabled")
+    try:
+        await components.reload(driver)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild components: {str(e)}")
+    return {"enabled": True, **components.stats()}
+
+# ----------------------- NETWORK -----------------------------------
+
+# Level-by-level ego network of a user, from the graph index when it is loaded
+def network_levels(session, user_id: uuid.UUID, depth: int, max_nodes: int, seed: int):
+    async def neighbors(frontier):
+        if graph_index is not None and graph_index.ready:
+            return {user_id: graph_index.neighbor_ids(user_id) for user_id in frontier}
+        return await neighbors_from_db(session, frontier)
+
+    async def names(ids):
+        return await names_from_db(session, ids)
+
+    return expand_network(neighbors, names, str(user_id), depth, max_nodes, seed)
+
+# Endpoint to get a user's network within depth hops as nodes plus integer-indexed edges.
+# With ?stream=true the result is sent as NDJSON, one chunk per hop, as each level is computed.
+@app.get("/users/{user_id}/network")
+async def get_user_network(
+    user_id: uuid.UUID,
+    depth: int = Query(2, ge=1, le=MAX_DEGREE),
+    max_nodes: int = Query(DEFAULT_NETWORK_NODES, ge=1, le=MAX_NETWORK_NODES),
+    seed: int = 0,
+    stream: bool = False
+):
+    # The lookup runs under the cheap gate; only the traversal takes an expensive slot
+    async with gated_session(gates["cheap"]) as session:
+        user = await find_by_uuid(session, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    timeout = ROUTE_QUERY_TIMEOUT_SECONDS["network"]
+    if stream:
+        admit_stream(gates["expensive"])
+        async def stream_levels():
+            async with gated_session(gates["expensive"], timeout) as stream_session:
+                async for level in network_levels(stream_session, user_id, depth, max_nodes, seed):
+                    yield json.dumps(level) + "\n"
+        return StreamingResponse(stream_levels(), media_type="application/x-ndjson")
+
+    async with gated_session(gates["expensive"], timeout) as session:
+        try:
+            nodes, edges, sampled = [], [], False
+            async for level in network_levels(session, user_id, depth, max_nodes, seed):
+                nodes.extend({"id": node["id"], "name": node["name"], "hop": node["hop"]} for node in level["nodes"])
+                edges.extend(level["edges"])
+                sampled = sampled or level["sampled"]
+            return {"root": str(user_id), "depth": depth, "nodes": nodes, "edges": edges, "sampled": sampled}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to load network: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field
+
+# Models
+class User(BaseModel):
+    id: uuid.UUID
+    name: str
+    email: EmailStr
+    school_year: int
+    num_of_connections: int = 0
+    invited_by: Optional[uuid.UUID] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "123e4567-e89b-12d3-a456-426614174000",
+                "name": "John Doe",
+                "email": "john@example.com",
+                "school_year": 2,
+                "num_of_connections": 0,
+                "invited_by": None
+            }
+        }
+
+class ConnectionRequest(BaseModel):
+    user1: uuid.UUID
+    user2: uuid.UUID
+
+class ConnectionByNameRequest(BaseModel):
+    name1: str
+    name2: str
+
+# Request model for connecting users by email
+class ConnectionByEmailRequest(BaseModel):
+    email1: EmailStr
+    email2: EmailStr
+
+# Post model
+class Post(BaseModel):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    content: str
+    author_id: uuid.UUID
+    visibility_degree: int
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+# Request model for resolving many users at once (POST /users/batch)
+class UserBatchRequest(BaseModel):
+    ids: List[uuid.UUID] = Field(default_factory=list, max_length=1000)
+    emails: List[EmailStr] = Field(default_factory=list, max_length=1000)
+
+# Request model for hop distances from one viewer to many users (POST /distances)
+class DistanceBatchRequest(BaseModel):
+    viewer_id: uuid.UUID
+    target_ids: List[uuid.UUID] = Field(max_length=1000)
@@ -0,0 +1,176 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from neo4j import unit_of_work
+from neo4j.exceptions import Neo4jError
+
+from utils.metrics import metrics
+
+# Admission control: each class of endpoint gets its own concurrency limit and
+# wait queue, so a few slow traversals cannot take every pool connection while
+# cheap lookups queue behind them. A limit of 0 turns that gate off.
+EXPENSIVE_CONCURRENCY = int(os.getenv("EXPENSIVE_CONCURRENCY", "8"))
+EXPENSIVE_QUEUE_DEPTH = int(os.getenv("EXPENSIVE_QUEUE_DEPTH", "16"))
+CHEAP_CONCURRENCY = int(os.getenv("CHEAP_CONCURRENCY", "64"))
+CHEAP_QUEUE_DEPTH = int(os.getenv("CHEAP_QUEUE_DEPTH", "256"))
+# Longest a request waits in the queue before it is shed anyway
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "2"))
+# Sent as Retry-After on 503s
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+
+# Server-side transaction timeouts, per gate (0 means the database default)
+EXPENSIVE_QUERY_TIMEOUT_SECONDS = float(os.getenv("EXPENSIVE_QUERY_TIMEOUT_SECONDS", "10"))
+CHEAP_QUERY_TIMEOUT_SECONDS = float(os.getenv("CHEAP_QUERY_TIMEOUT_SECONDS", "3"))
+# Per-endpoint overrides for the expensive gate, e.g. FEED_QUERY_TIMEOUT_SECONDS;
+# an unset one falls back to EXPENSIVE_QUERY_TIMEOUT_SECONDS
+EXPENSIVE_ROUTES = ("feed", "network", "separation", "distances", "dashboard")
+ROUTE_QUERY_TIMEOUT_SECONDS = {
+    route: float(os.getenv(f"{route.upper()}_QUERY_TIMEOUT_SECONDS", str(EXPENSIVE_QUERY_TIMEOUT_SECONDS)))
+    for route in EXPENSIVE_ROUTES
+}
+
+# Serve a cached or depth-reduced feed instead of failing when the feed is shed or times out
+FEED_DEGRADED_ENABLED = os.getenv("FEED_DEGRADED_ENABLED", "false").lower() in ("1", "true", "yes")
+DEGRADED_FEED_DEPTH = int(os.getenv("DEGRADED_FEED_DEPTH", "1"))
+
+# Request shed by a full gate. An HTTPException, so endpoints' "except HTTPException: raise" passes it through.
+class Overloaded(HTTPException):
+    def __init__(self, gate: str, retry_after: int = ADMISSION_RETRY_AFTER_SECONDS):
+        super().__init__(
+            status_code=503,
+            detail=f"Server is busy ({gate} requests), retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+# A transaction ran past its timeout
+class QueryTimeout(HTTPException):
+    def __init__(self, gate: str, timeout: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Query timed out after {timeout:g}s ({gate} requests)",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+
+def is_timeout(error: Exception) -> bool:
+    return isinstance(error, Neo4jError) and "TransactionTimedOut" in (error.code or "")
+
+# Concurrency limit with a bounded wait queue; past max_queue waiters (or after
+# max_wait seconds in the queue) requests are shed with Overloaded
+class AdmissionGate:
+    def __init__(self, name: str, concurrency: int, max_queue: int, query_timeout: float,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.query_timeout = query_timeout
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        # Admitted plus queued requests, counted synchronously on arrival so a
+        # burst within one event loop tick cannot overrun the queue bound
+        self.reserved = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    # Would a new request be shed right now?
+    @property
+    def full(self) -> bool:
+        return self.semaphore is not None and self.reserved >= self.concurrency + self.max_queue
+
+    def reject(self):
+        self.shed += 1
+        metrics.increment(f"admission_shed_{self.name}")
+        raise Overloaded(self.name)
+
+    def timed_out(self, timeout: Optional[float] = None):
+        self.timeouts += 1
+        metrics.increment(f"query_timeouts_{self.name}")
+        raise QueryTimeout(self.name, self.query_timeout if timeout is None else timeout)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.semaphore is not None:
+            if self.full:
+                self.reject()
+            self.reserved += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.reserved -= 1
+                self.reject()
+            except BaseException:
+                self.reserved -= 1
+                raise
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        self.update_gauges()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.semaphore is not None:
+                self.semaphore.release()
+                self.reserved -= 1
+            self.update_gauges()
+
+    def update_gauges(self):
+        metrics.set_gauge(f"admission_in_flight_{self.name}", self.in_flight)
+        metrics.set_gauge(f"admission_waiting_{self.name}", self.waiting)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "query_timeout_seconds": self.query_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+        }
+
+# Session wrapper that runs every managed transaction with the gate's timeout
+# (or the given per-endpoint one) and turns a server-side timeout into QueryTimeout
+class GatedSession:
+    def __init__(self, session, gate: AdmissionGate, timeout: Optional[float] = None):
+        self.session = session
+        self.gate = gate
+        self.timeout = gate.query_timeout if timeout is None else timeout
+
+    def with_timeout(self, work):
+        if not self.timeout:
+            return work
+        return unit_of_work(timeout=self.timeout)(work)
+
+    async def execute_read(self, work, *args, **kwargs):
+        try:
+            return await self.session.execute_read(self.with_timeout(work), *args, **kwargs)
+        except Neo4jError as e:
+            if is_timeout(e):
+                self.gate.timed_out(self.timeout)
+            raise
+
+    async def execute_write(self, work, *args, **kwargs):
+        try:
+            return await self.session.execute_write(self.with_timeout(work), *args, **kwargs)
+        except Neo4jError as e:
+            if is_timeout(e):
+                self.gate.timed_out(self.timeout)
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+def build_gates() -> dict:
+    return {
+        "expensive": AdmissionGate("expensive", EXPENSIVE_CONCURRENCY, EXPENSIVE_QUEUE_DEPTH, EXPENSIVE_QUERY_TIMEOUT_SECONDS),
+        "cheap": AdmissionGate("cheap", CHEAP_CONCURRENCY, CHEAP_QUEUE_DEPTH, CHEAP_QUERY_TIMEOUT_SECONDS),
+    }
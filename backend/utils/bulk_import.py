@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import time
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from models import User, ConnectionRequest, Post
+from utils.neo4j_utils import fetch_single
+from utils.metrics import named_query
+from utils.driver import create_driver
+
+DEFAULT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ("ndjson", "csv")
+# Invalid rows / failed batches echoed back in a report (the counts are always complete)
+MAX_REPORTED_ERRORS = 20
+
+# Users are merged on id, so reruns update rather than duplicate.
+# num_of_connections starts at 0 and is maintained by the connections import.
+IMPORT_USERS_QUERY = named_query("import_users", """
+UNWIND $rows AS row
+MERGE (u:User {id: row.id})
+ON CREATE SET u.num_of_connections = 0
+SET u.name = row.name,
+    u.email = row.email,
+    u.school_year = row.school_year,
+    u.invited_by = row.invited_by
+RETURN count(u) AS written
+""")
+
+# Same semantics as connect_by: merge both directions and bump each user's
+# counter once per edge that did not exist yet. Increments for a user that
+# appears in several rows are summed and applied with a single SET.
+IMPORT_CONNECTIONS_QUERY = named_query("import_connections", """
+UNWIND $rows AS row
+MATCH (u1:User {id: row.user1})
+MATCH (u2:User {id: row.user2})
+WITH u1, u2, EXISTS { (u1)-[:CONNECTED_TO]->(u2) } AS already_connected
+MERGE (u1)-[:CONNECTED_TO]->(u2)
+MERGE (u2)-[:CONNECTED_TO]->(u1)
+WITH count(*) AS written,
+     collect(CASE WHEN already_connected THEN null ELSE u1 END) +
+     collect(CASE WHEN already_connected THEN null ELSE u2 END) AS endpoints
+CALL {
+    WITH endpoints
+    UNWIND endpoints AS u
+    WITH u, count(*) AS added
+    SET u.num_of_connections = coalesce(u.num_of_connections, 0) + added
+    RETURN count(u) AS updated
+}
+RETURN written, size(endpoints) / 2 AS created
+""")
+
+IMPORT_POSTS_QUERY = named_query("import_posts", """
+UNWIND $rows AS row
+MATCH (u:User {id: row.author_id})
+MERGE (p:Post {id: row.id})
+ON CREATE SET p.content = row.content,
+              p.visibility_degree = row.visibility_degree,
+              p.timestamp = row.timestamp
+MERGE (p)-[:POSTED_BY]->(u)
+RETURN count(p) AS written
+""")
+
+# Turn a validated model into the parameter row for its import query
+def user_row(user: User) -> dict:
+    return {
+        "id": str(user.id),
+        "name": user.name,
+        "email": user.email,
+        "school_year": user.school_year,
+        "invited_by": str(user.invited_by) if user.invited_by else None,
+    }
+
+def connection_row(connection: ConnectionRequest) -> dict:
+    return {"user1": str(connection.user1), "user2": str(connection.user2)}
+
+def post_row(post: Post) -> dict:
+    return {
+        "id": str(post.id),
+        "author_id": str(post.author_id),
+        "content": post.content,
+        "visibility_degree": post.visibility_degree,
+        "timestamp": post.timestamp,
+    }
+
+IMPORT_KINDS = {
+    "users": (User, user_row, IMPORT_USERS_QUERY),
+    "connections": (ConnectionRequest, connection_row, IMPORT_CONNECTIONS_QUERY),
+    "posts": (Post, post_row, IMPORT_POSTS_QUERY),
+}
+
+# Split a byte stream (e.g. a request body) into text lines without buffering it whole
+async def stream_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iterate_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+# Parse NDJSON or CSV (header row first) lines into (line number, dict) pairs.
+# Empty CSV cells become None so optional model fields fall back to their defaults.
+async def parse_rows(lines: AsyncIterator[str], fmt: str):
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, e
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield line_number, {
+                name: (value if value != "" else None)
+                for name, value in zip(header, values)
+                if name
+            }
+
+# Deduplicate edges within a batch (either direction), so the existence check
+# in IMPORT_CONNECTIONS_QUERY never sees the same pair twice in one statement
+def dedupe_connections(rows: list) -> list:
+    seen = set()
+    unique = []
+    for row in rows:
+        pair = tuple(sorted((row["user1"], row["user2"])))
+        if pair[0] != pair[1] and pair not in seen:
+            seen.add(pair)
+            unique.append(row)
+    return unique
+
+# Stream rows of one kind into Neo4j in batches of batch_size, one UNWIND
+# transaction per batch. Invalid rows and failed batches are counted and
+# reported without stopping the import. progress, if given, is called with the
+# running report after every batch.
+async def import_rows(driver, kind: str, lines: AsyncIterator[str], fmt: str = "ndjson",
+                      batch_size: int = DEFAULT_BATCH_SIZE,
+                      progress: Optional[Callable[[dict], None]] = None) -> dict:
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+    model, to_row, query = IMPORT_KINDS[kind]
+
+    started = time.monotonic()
+    report = {
+        "kind": kind,
+        "rows_read": 0,
+        "rows_invalid": 0,
+        "rows_written": 0,
+        "connections_created": 0,
+        "batches": 0,
+        "batches_failed": 0,
+        "invalid_rows": [],
+        "failed_batches": [],
+        "elapsed_seconds": 0.0,
+        "rows_per_second": 0.0,
+    }
+
+    async def flush(batch: list, first_line: int):
+        rows = dedupe_connections(batch) if kind == "connections" else batch
+        report["batches"] += 1
+        try:
+            async with driver.session() as session:
+                record = await session.execute_write(fetch_single, query, rows=rows)
+            report["rows_written"] += record["written"]
+            if kind == "connections":
+                report["connections_created"] += record["created"]
+        except Exception as e:
+            report["batches_failed"] += 1
+            if len(report["failed_batches"]) < MAX_REPORTED_ERRORS:
+                report["failed_batches"].append({
+                    "batch": report["batches"],
+                    "first_line": first_line,
+                    "rows": len(batch),
+                    "error": str(e),
+                })
+        elapsed = time.monotonic() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["rows_read"] / elapsed, 1) if elapsed > 0 else 0.0
+        if progress is not None:
+            progress(report)
+
+    batch = []
+    first_line = None
+    async for line_number, data in parse_rows(lines, fmt):
+        report["rows_read"] += 1
+        try:
+            if isinstance(data, Exception):
+                raise data
+            row = to_row(model(**data))
+        except (ValidationError, ValueError, TypeError) as e:
+            report["rows_invalid"] += 1
+            if len(report["invalid_rows"]) < MAX_REPORTED_ERRORS:
+                report["invalid_rows"].append({"line": line_number, "error": str(e)})
+            continue
+
+        if not batch:
+            first_line = line_number
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush(batch, first_line)
+            batch = []
+
+    if batch:
+        await flush(batch, first_line)
+
+    elapsed = time.monotonic() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows_read"] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+def print_progress(report: dict):
+    print(
+        f"[{report['kind']}] batch {report['batches']}: "
+        f"{report['rows_read']} read, {report['rows_written']} written, "
+        f"{report['rows_invalid']} invalid, {report['batches_failed']} failed batches, "
+        f"{report['rows_per_second']} rows/s"
+    )
+
+async def run_import(kind: str, path: str, fmt: Optional[str], batch_size: int) -> dict:
+    load_dotenv()
+    fmt = fmt or ("csv" if path.endswith(".csv") else "ndjson")
+    driver = create_driver()
+    try:
+        with open(path, encoding="utf-8", newline="") as source:
+            return await import_rows(driver, kind, iterate_lines(source), fmt, batch_size, print_progress)
+    finally:
+        await driver.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users, connections or posts into Neo4j")
+    parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+    parser.add_argument("path", help="NDJSON or CSV file (CSV needs a header row)")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_import(args.kind, args.path, args.format, args.batch_size))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
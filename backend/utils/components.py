@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Connected components of the CONNECTED_TO graph, kept with union-find
+COMPONENTS_ENABLED = os.getenv("COMPONENTS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Full rescans pick up edges written by other workers or directly in the database;
+# until then such merges are unseen and two users can look unreachable
+COMPONENTS_RELOAD_SECONDS = float(os.getenv("COMPONENTS_RELOAD_SECONDS", "300"))
+
+LOAD_USERS_QUERY = """
+MATCH (u:User)
+RETURN u.id AS id
+"""
+
+LOAD_EDGES_QUERY = """
+MATCH (a:User)-[:CONNECTED_TO]->(b:User)
+WHERE a.id < b.id
+RETURN a.id AS source, b.id AS target
+"""
+
+# Union-find over user ids (union by size, path halving).
+# Edges are never removed, so components only ever merge and one full scan
+# plus a union per new connection keeps it exact.
+class ComponentTracker:
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+        self.size: Dict[str, int] = {}
+        self.loaded_at: Optional[float] = None
+        self.loading = False
+        self.replay: List[tuple] = []
+        self.unions_since_load = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    def add_user(self, user_id: str):
+        user_id = str(user_id)
+        if user_id not in self.parent:
+            self.parent[user_id] = user_id
+            self.size[user_id] = 1
+
+    def find(self, user_id: str) -> str:
+        parent = self.parent
+        while parent[user_id] != user_id:
+            parent[user_id] = parent[parent[user_id]]
+            user_id = parent[user_id]
+        return user_id
+
+    # Merge the components of a new edge's endpoints; returns True if they were separate
+    def union(self, user1_id: str, user2_id: str) -> bool:
+        user1_id, user2_id = str(user1_id), str(user2_id)
+        if self.loading:
+            self.replay.append((user1_id, user2_id))
+        self.add_user(user1_id)
+        self.add_user(user2_id)
+        root1, root2 = self.find(user1_id), self.find(user2_id)
+        if root1 == root2:
+            return False
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size.pop(root2)
+        self.unions_since_load += 1
+        return True
+
+    # True/False when both users are known; None when either is not (e.g. created
+    # by another worker), so callers fall back to searching
+    def connected(self, user1_id: str, user2_id: str) -> Optional[bool]:
+        user1_id, user2_id = str(user1_id), str(user2_id)
+        if not self.ready or user1_id not in self.parent or user2_id not in self.parent:
+            return None
+        return self.find(user1_id) == self.find(user2_id)
+
+    # (component id, size) of a user; the id is the component's current root user
+    def component(self, user_id: str) -> Optional[tuple]:
+        user_id = str(user_id)
+        if not self.ready or user_id not in self.parent:
+            return None
+        root = self.find(user_id)
+        return root, self.size[root]
+
+    async def reload(self, driver):
+        self.loading = True
+        self.replay = []
+        try:
+            fresh = ComponentTracker()
+            async with driver.session() as session:
+                result = await session.run(LOAD_USERS_QUERY)
+                async for record in result:
+                    fresh.add_user(record["id"])
+                result = await session.run(LOAD_EDGES_QUERY)
+                async for record in result:
+                    fresh.union(record["source"], record["target"])
+            self.parent, self.size = fresh.parent, fresh.size
+            self.loaded_at = time.time()
+            self.unions_since_load = 0
+        finally:
+            self.loading = False
+
+        replay, self.replay = self.replay, []
+        for user1_id, user2_id in replay:
+            self.union(user1_id, user2_id)
+
+    # Component count, largest components and a size histogram ({size: how many components})
+    def stats(self, largest: int = 10) -> dict:
+        sizes = sorted(((size, root) for root, size in self.size.items()), reverse=True)
+        return {
+            "ready": self.ready,
+            "users": len(self.parent),
+            "components": len(self.size),
+            "largest": [{"id": root, "size": size} for size, root in sizes[:largest]],
+            "size_histogram": dict(sorted(Counter(self.size.values()).items())),
+            "loaded_at": self.loaded_at,
+            "unions_since_load": self.unions_since_load,
+        }
+
+async def refresh_periodically(tracker: ComponentTracker, driver, interval: float = COMPONENTS_RELOAD_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await tracker.reload(driver)
+        except Exception as e:
+            print(f"Failed to reload components: {str(e)}")
@@ -0,0 +1,180 @@
+import os
+import time
+from array import array
+from typing import List, Optional
+
+from utils.graph_index import GraphIndex, run_in_worker
+from utils.traversal import MAX_DEGREE
+
+# Landmark distance index over the graph index (needs GRAPH_INDEX_ENABLED)
+DISTANCE_ORACLE_ENABLED = os.getenv("DISTANCE_ORACLE_ENABLED", "false").lower() in ("1", "true", "yes")
+DISTANCE_ORACLE_LANDMARKS = int(os.getenv("DISTANCE_ORACLE_LANDMARKS", "16"))
+# Edges added since the last build after which a rebuild is due
+DISTANCE_ORACLE_MAX_STALE_EDGES = int(os.getenv("DISTANCE_ORACLE_MAX_STALE_EDGES", "1000"))
+# Past this many targets needing an exact answer, one BFS from the viewer
+# is cheaper than a bidirectional search per target
+DISTANCE_ORACLE_BFS_THRESHOLD = int(os.getenv("DISTANCE_ORACLE_BFS_THRESHOLD", "32"))
+
+# Distances are stored as unsigned bytes; this marks "not reachable"
+UNREACHABLE = 255
+
+# Precomputed BFS distances from a few high-degree landmark users to everyone.
+# For users u, v and any landmark l, the triangle inequality bounds d(u, v):
+#   |d(l, u) - d(l, v)| <= d(u, v) <= d(l, u) + d(l, v)
+# The tightest bounds over all landmarks often meet; otherwise, if the distance
+# may be within MAX_DEGREE, an exact bounded search on the graph index settles it.
+class DistanceOracle:
+    def __init__(self, landmark_count: int = DISTANCE_ORACLE_LANDMARKS):
+        self.landmark_count = landmark_count
+        self.landmarks: List[int] = []
+        self.distances: List[array] = []
+        self.ids: Optional[List[str]] = None
+        self.size = 0
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.edges_since_build = 0
+        self.building = False
+
+    # Usable only against the same graph index snapshot it was built from
+    def usable(self, index: GraphIndex) -> bool:
+        return self.built_at is not None and index.ids is self.ids
+
+    @property
+    def stale(self) -> bool:
+        return self.edges_since_build > 0
+
+    @property
+    def rebuild_due(self) -> bool:
+        return self.edges_since_build >= DISTANCE_ORACLE_MAX_STALE_EDGES
+
+    async def rebuild(self, index: GraphIndex):
+        self.building = True
+        try:
+            await self.compute(index)
+        finally:
+            self.building = False
+
+    # The landmark BFS passes walk the whole graph, so they run in a worker
+    # process over a snapshot of the index while the event loop keeps serving
+    async def compute(self, index: GraphIndex):
+        started = time.perf_counter()
+        ids = index.ids
+        snapshot = index.snapshot()
+        landmarks, distances = await run_in_worker(landmark_distances, snapshot, self.landmark_count)
+        # The index was reloaded meanwhile; the reload's own rebuild takes over
+        if index.ids is not ids:
+            return
+
+        self.landmarks, self.distances = landmarks, distances
+        self.ids, self.size = ids, len(snapshot.ids)
+        self.built_at = time.time()
+        self.build_seconds = round(time.perf_counter() - started, 3)
+        self.edges_since_build = 0
+
+    # New edges can only shorten distances: upper bounds stay valid, lower bounds may not
+    def add_edge(self):
+        if self.built_at is not None:
+            self.edges_since_build += 1
+
+    # Triangle-inequality bounds between two positions: (lower, upper).
+    # upper is None when no landmark reaches both; (None, None) when the users are
+    # provably in different components.
+    def bounds(self, source: int, target: int):
+        if source == target:
+            return 0, 0
+        if source >= self.size or target >= self.size:
+            return 1, None
+        lower, upper = 1, None
+        for distances in self.distances:
+            from_source, from_target = distances[source], distances[target]
+            if from_source == UNREACHABLE and from_target == UNREACHABLE:
+                continue
+            if from_source == UNREACHABLE or from_target == UNREACHABLE:
+                # One side reaches the landmark and the other does not
+                if not self.stale:
+                    return None, None
+                continue
+            lower = max(lower, abs(from_source - from_target))
+            total = from_source + from_target
+            upper = total if upper is None else min(upper, total)
+        if self.stale:
+            lower = 1
+        return lower, upper
+
+    # Hop distance from viewer_id to each target id. Each result is
+    #   {"id", "distance", "exact", "lower", "upper"}
+    # where distance is None when the users are more than MAX_DEGREE hops apart
+    # (or not connected at all) and exact tells whether distance is certain.
+    def distances_from(self, index: GraphIndex, viewer_id: str, target_ids: List[str]) -> List[dict]:
+        viewer = index.positions.get(str(viewer_id))
+        results = []
+        pending = []
+        for target_id in target_ids:
+            target_id = str(target_id)
+            target = index.positions.get(target_id)
+            if viewer is None or target is None:
+                results.append({"id": target_id, "distance": None, "exact": True, "lower": None, "upper": None})
+                continue
+            lower, upper = self.bounds(viewer, target)
+            result = {"id": target_id, "distance": None, "exact": False, "lower": lower, "upper": upper}
+            results.append(result)
+            if lower is None:
+                result["exact"] = True
+            elif lower == upper:
+                result.update(distance=upper if upper <= MAX_DEGREE else None, exact=True)
+            elif lower > MAX_DEGREE:
+                result["exact"] = True
+            else:
+                pending.append((result, target_id))
+
+        if len(pending) > DISTANCE_ORACLE_BFS_THRESHOLD:
+            depth = max(min(result["upper"] or MAX_DEGREE, MAX_DEGREE) for result, _ in pending)
+            reached = index.k_hop(viewer_id, depth)
+            for result, target_id in pending:
+                result.update(distance=reached.get(target_id), exact=True)
+        else:
+            for result, target_id in pending:
+                depth = min(result["upper"] or MAX_DEGREE, MAX_DEGREE)
+                path = index.shortest_path(viewer_id, target_id, depth)
+                result.update(distance=len(path) - 1 if path else None, exact=True)
+        return results
+
+    def memory_bytes(self) -> int:
+        return sum(distances.buffer_info()[1] * distances.itemsize for distances in self.distances)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.built_at is not None,
+            "landmarks": len(self.landmarks),
+            "users": self.size,
+            "memory_bytes": self.memory_bytes(),
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "edges_since_build": self.edges_since_build,
+            "stale": self.stale,
+            "building": self.building,
+            "rebuild_due": self.rebuild_due,
+        }
+
+# Full BFS from one position over the index, as a byte per user
+def bfs(index: GraphIndex, start: int, size: int) -> array:
+    distances = array("B", [UNREACHABLE]) * size
+    distances[start] = 0
+    frontier = [start]
+    depth = 0
+    while frontier and depth < UNREACHABLE - 1:
+        depth += 1
+        next_frontier = []
+        for position in frontier:
+            for neighbor in index.neighbors(position):
+                if neighbor < size and distances[neighbor] == UNREACHABLE:
+                    distances[neighbor] = depth
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances
+
+# Worker: the highest-degree positions of a (snapshot) index and a BFS from each
+def landmark_distances(index: GraphIndex, landmark_count: int):
+    size = len(index.ids)
+    landmarks = sorted(range(size), key=lambda position: -index.degree(position))[:landmark_count]
+    return landmarks, [bfs(index, landmark, size) for landmark in landmarks]
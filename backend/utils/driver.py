@@ -0,0 +1,61 @@
+import asyncio
+import os
+from typing import Optional
+
+from neo4j import AsyncGraphDatabase
+
+from utils.metrics import metrics
+
+# Connection pool tuning (seconds where applicable)
+NEO_MAX_POOL_SIZE = int(os.getenv("NEO_MAX_POOL_SIZE", "100"))
+NEO_ACQUISITION_TIMEOUT = float(os.getenv("NEO_ACQUISITION_TIMEOUT", "60"))
+NEO_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO_MAX_CONNECTION_LIFETIME", "3600"))
+NEO_CONNECTION_TIMEOUT = float(os.getenv("NEO_CONNECTION_TIMEOUT", "30"))
+# Idle pooled connections older than this are pinged before reuse (unset = never)
+NEO_LIVENESS_CHECK_TIMEOUT = os.getenv("NEO_LIVENESS_CHECK_TIMEOUT")
+
+# Connections to open up front, so the first requests do not pay for the handshake
+NEO_WARMUP_CONNECTIONS = int(os.getenv("NEO_WARMUP_CONNECTIONS", "0"))
+
+def pool_config() -> dict:
+    config = {
+        "max_connection_pool_size": NEO_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO_ACQUISITION_TIMEOUT,
+        "max_connection_lifetime": NEO_MAX_CONNECTION_LIFETIME,
+        "connection_timeout": NEO_CONNECTION_TIMEOUT,
+    }
+    if NEO_LIVENESS_CHECK_TIMEOUT:
+        config["liveness_check_timeout"] = float(NEO_LIVENESS_CHECK_TIMEOUT)
+    return config
+
+# Build the async driver from NEO_URI / NEO_USER / NEO_PASS and the pool settings.
+# No I/O happens here; connections are opened on first use (or by warm_up).
+def create_driver():
+    uri, user, password = os.getenv("NEO_URI"), os.getenv("NEO_USER"), os.getenv("NEO_PASS")
+    if not all([uri, user, password]):
+        raise ValueError("Missing required Neo4j environment variables")
+    metrics.set_gauge("pool_max_size", NEO_MAX_POOL_SIZE)
+    return AsyncGraphDatabase.driver(uri, auth=(user, password), **pool_config())
+
+async def ping(driver):
+    async with driver.session() as session:
+        result = await session.run("RETURN 1 AS ok")
+        await result.consume()
+
+# Open up to connections pooled connections by running that many pings at once
+async def warm_up(driver, connections: int = NEO_WARMUP_CONNECTIONS) -> int:
+    connections = min(connections, NEO_MAX_POOL_SIZE)
+    if connections <= 0:
+        return 0
+    results = await asyncio.gather(*(ping(driver) for _ in range(connections)), return_exceptions=True)
+    return sum(1 for result in results if not isinstance(result, Exception))
+
+# Round trip to the database within timeout seconds; returns the error message or None
+async def check_database(driver, timeout: float) -> Optional[str]:
+    try:
+        await asyncio.wait_for(ping(driver), timeout)
+        return None
+    except asyncio.TimeoutError:
+        return f"no response within {timeout}s"
+    except Exception as e:
+        return str(e)
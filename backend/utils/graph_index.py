@@ -0,0 +1,282 @@
+import asyncio
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.traversal import MAX_DEGREE
+
+# Optional in-process copy of the CONNECTED_TO graph
+GRAPH_INDEX_ENABLED = os.getenv("GRAPH_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+GRAPH_INDEX_RELOAD_SECONDS = float(os.getenv("GRAPH_INDEX_RELOAD_SECONDS", "300"))
+# Processes for full passes over the graph (suggestion and landmark rebuilds)
+GRAPH_WORKERS = int(os.getenv("GRAPH_WORKERS", "1"))
+
+LOAD_USERS_QUERY = """
+MATCH (u:User)
+RETURN u.id AS id
+"""
+
+LOAD_EDGES_QUERY = """
+MATCH (a:User)-[:CONNECTED_TO]->(b:User)
+RETURN a.id AS source, b.id AS target
+"""
+
+# Compressed adjacency of the social graph.
+# User UUIDs are mapped to dense ints; neighbors live in flat CSR arrays
+# (offsets/targets) built at load time, plus small per-user overflow arrays
+# for edges added since the last load.
+class GraphIndex:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.offsets = array("q", [0])
+        self.targets = array("i")
+        self.added: Dict[int, array] = {}
+        self.edge_count = 0
+        self.loaded_at: Optional[float] = None
+        self.updates_since_load = 0
+        self.loading = False
+        self.replay: List[tuple] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    # Dense int for a user id, registering the user if it is new
+    def position(self, user_id: str) -> int:
+        position = self.positions.get(user_id)
+        if position is None:
+            position = len(self.ids)
+            self.ids.append(user_id)
+            self.positions[user_id] = position
+        return position
+
+    def neighbors(self, position: int):
+        if position + 1 < len(self.offsets):
+            yield from self.targets[self.offsets[position]:self.offsets[position + 1]]
+        extra = self.added.get(position)
+        if extra is not None:
+            yield from extra
+
+    def neighbor_ids(self, user_id: str) -> List[str]:
+        position = self.positions.get(user_id)
+        if position is None:
+            return []
+        return [self.ids[neighbor] for neighbor in self.neighbors(position)]
+
+    def degree(self, position: int) -> int:
+        base = 0
+        if position + 1 < len(self.offsets):
+            base = self.offsets[position + 1] - self.offsets[position]
+        return base + len(self.added.get(position, ()))
+
+    def has_edge(self, source: int, target: int) -> bool:
+        return any(neighbor == target for neighbor in self.neighbors(source))
+
+    def add_user(self, user_id: str):
+        self.position(str(user_id))
+
+    # Record a new (bidirectional) connection; returns False if it was already known
+    def add_edge(self, user1_id: str, user2_id: str) -> bool:
+        user1_id, user2_id = str(user1_id), str(user2_id)
+        if self.loading:
+            self.replay.append((user1_id, user2_id))
+        source, target = self.position(user1_id), self.position(user2_id)
+        if source == target or self.has_edge(source, target):
+            return False
+        self.added.setdefault(source, array("i")).append(target)
+        self.added.setdefault(target, array("i")).append(source)
+        self.edge_count += 2
+        self.updates_since_load += 1
+        return True
+
+    # Hop distance of every user within max_depth of user_id (user_id itself is 0).
+    # With max_nodes, expansion stops once more than max_nodes users have been reached.
+    def k_hop(self, user_id: str, max_depth: int, max_nodes: Optional[int] = None) -> Dict[str, int]:
+        user_id = str(user_id)
+        start = self.positions.get(user_id)
+        if start is None:
+            return {user_id: 0}
+
+        distances = {start: 0}
+        frontier = [start]
+        depth = 0
+        while frontier and depth < min(max_depth, MAX_DEGREE):
+            if max_nodes is not None and len(distances) > max_nodes:
+                break
+            depth += 1
+            next_frontier = []
+            for position in frontier:
+                for neighbor in self.neighbors(position):
+                    if neighbor not in distances:
+                        distances[neighbor] = depth
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        return {self.ids[position]: distance for position, distance in distances.items()}
+
+    # Shortest path between two users within max_depth hops, as a list of user ids (or None).
+    # Bidirectional BFS expanding the smaller frontier first.
+    def shortest_path(self, user1_id: str, user2_id: str, max_depth: int = MAX_DEGREE) -> Optional[List[str]]:
+        source = self.positions.get(str(user1_id))
+        target = self.positions.get(str(user2_id))
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [self.ids[source]]
+
+        forward = {source: (None, 0)}
+        backward = {target: (None, 0)}
+        forward_frontier, backward_frontier = [source], [target]
+        forward_depth = backward_depth = 0
+
+        while forward_frontier and backward_frontier and forward_depth + backward_depth < max_depth:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_depth += 1
+                frontier, visited, other, depth = forward_frontier, forward, backward, forward_depth
+            else:
+                backward_depth += 1
+                frontier, visited, other, depth = backward_frontier, backward, forward, backward_depth
+
+            next_frontier = []
+            for position in frontier:
+                for neighbor in self.neighbors(position):
+                    if neighbor not in visited:
+                        visited[neighbor] = (position, depth)
+                        next_frontier.append(neighbor)
+
+            if visited is forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+            meetings = [position for position in next_frontier if position in other]
+            if meetings:
+                meeting = min(meetings, key=lambda position: forward[position][1] + backward[position][1])
+                path = []
+                position = meeting
+                while position is not None:
+                    path.append(position)
+                    position = forward[position][0]
+                path.reverse()
+                position = backward[meeting][0]
+                while position is not None:
+                    path.append(position)
+                    position = backward[position][0]
+                return [self.ids[position] for position in path]
+
+        return None
+
+    # Rebuild the CSR arrays from Neo4j and swap them in.
+    # Edges recorded while the load is running are replayed onto the new arrays.
+    async def reload(self, driver):
+        self.loading = True
+        self.replay = []
+        try:
+            ids: List[str] = []
+            positions: Dict[str, int] = {}
+            sources = array("i")
+            targets = array("i")
+
+            async with driver.session() as session:
+                result = await session.run(LOAD_USERS_QUERY)
+                async for record in result:
+                    if record["id"] not in positions:
+                        positions[record["id"]] = len(ids)
+                        ids.append(record["id"])
+
+                result = await session.run(LOAD_EDGES_QUERY)
+                async for record in result:
+                    source = positions.get(record["source"])
+                    target = positions.get(record["target"])
+                    if source is not None and target is not None:
+                        sources.append(source)
+                        targets.append(target)
+
+            # Counting sort of the edge list into CSR form
+            offsets = array("q", [0]) * (len(ids) + 1)
+            for source in sources:
+                offsets[source + 1] += 1
+            for position in range(len(ids)):
+                offsets[position + 1] += offsets[position]
+            csr_targets = array("i", [0]) * len(targets)
+            cursor = offsets[:-1]
+            for source, target in zip(sources, targets):
+                csr_targets[cursor[source]] = target
+                cursor[source] += 1
+
+            self.ids, self.positions = ids, positions
+            self.offsets, self.targets = offsets, csr_targets
+            self.added = {}
+            self.edge_count = len(csr_targets)
+            self.loaded_at = time.time()
+            self.updates_since_load = 0
+        finally:
+            self.loading = False
+
+        replay, self.replay = self.replay, []
+        for user1_id, user2_id in replay:
+            self.add_edge(user1_id, user2_id)
+
+    # Frozen copy to hand to a worker while this index keeps taking new
+    # users and edges. The CSR arrays are never modified in place, so they are
+    # shared; ids and the overflow edges are copied. Positions only (no id lookups).
+    def snapshot(self) -> "GraphIndex":
+        frozen = GraphIndex()
+        frozen.ids = list(self.ids)
+        frozen.offsets, frozen.targets = self.offsets, self.targets
+        frozen.added = {position: array("i", extra) for position, extra in self.added.items()}
+        frozen.edge_count = self.edge_count
+        frozen.loaded_at = self.loaded_at
+        return frozen
+
+    # Approximate memory held by the index, in bytes
+    def memory_bytes(self) -> int:
+        total = sys.getsizeof(self.offsets) + sys.getsizeof(self.targets)
+        total += sys.getsizeof(self.ids) + sum(sys.getsizeof(user_id) for user_id in self.ids)
+        total += sys.getsizeof(self.positions)
+        total += sys.getsizeof(self.added) + sum(sys.getsizeof(extra) for extra in self.added.values())
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "users": len(self.ids),
+            "edges": self.edge_count,
+            "memory_bytes": self.memory_bytes(),
+            "loaded_at": self.loaded_at,
+            "age_seconds": round(time.time() - self.loaded_at, 3) if self.ready else None,
+            "updates_since_load": self.updates_since_load,
+        }
+
+# Background task: reload the index from the database every interval seconds,
+# then run after_reload (e.g. to rebuild structures derived from the index)
+async def refresh_periodically(index: GraphIndex, driver, interval: float,
+                               after_reload: Optional[Callable[[], Awaitable]] = None):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await index.reload(driver)
+            if after_reload is not None:
+                await after_reload()
+        except Exception as e:
+            print(f"Failed to reload graph index: {str(e)}")
+
+# Full passes over the graph run on a snapshot in a worker process, so they
+# hold neither the event loop nor the GIL. The pool is started on first use.
+worker_pool: Optional[ProcessPoolExecutor] = None
+
+async def run_in_worker(func: Callable, *args):
+    global worker_pool
+    if worker_pool is None:
+        worker_pool = ProcessPoolExecutor(max_workers=GRAPH_WORKERS)
+    return await asyncio.get_running_loop().run_in_executor(worker_pool, func, *args)
+
+def shutdown_workers():
+    global worker_pool
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False, cancel_futures=True)
+        worker_pool = None
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils.components import ComponentTracker, LOAD_USERS_QUERY, LOAD_EDGES_QUERY
+from utils.driver import create_driver
+
+# Offline degree distribution and component histogram over a graph snapshot.
+# The snapshot uses the bulk import NDJSON layout: connections.ndjson rows are
+# {"user1", "user2"} with each undirected connection once (as benchmarks.generate
+# and --export write them), users.ndjson rows carry "id" and add users with no
+# connections. The connections file is split into byte ranges scanned in parallel
+# by a process pool; each worker returns partial degree counts and a union-find
+# forest of its edges, which are merged here.
+
+# Byte ranges of roughly equal size; a range owns the lines that start inside it
+def chunk_ranges(path: str, chunks: int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    if size == 0:
+        return [(0, 0)]
+    chunks = max(1, min(chunks, size))
+    step = -(-size // chunks)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+def read_range(path: str, start: int, end: int):
+    with open(path, "rb") as source:
+        if start > 0:
+            # Skip the line that started in the previous range
+            source.seek(start - 1)
+            source.readline()
+        while source.tell() < end:
+            line = source.readline()
+            if not line:
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+# Worker: degree counts and node -> local root for one range of the connections file
+def scan_connections(path: str, start: int, end: int) -> Tuple[Dict[str, int], Dict[str, str], int]:
+    degrees: Counter = Counter()
+    forest = ComponentTracker()
+    edges = 0
+    for row in read_range(path, start, end):
+        user1, user2 = str(row["user1"]), str(row["user2"])
+        if user1 == user2:
+            continue
+        degrees[user1] += 1
+        degrees[user2] += 1
+        forest.union(user1, user2)
+        edges += 1
+    return dict(degrees), {node: forest.find(node) for node in forest.parent}, edges
+
+def percentile(sorted_values: List[int], share: float) -> int:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+def compute_stats(connections_path: str, users_path: Optional[str] = None,
+                  workers: Optional[int] = None, chunks: Optional[int] = None, largest: int = 10) -> dict:
+    started = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+    ranges = chunk_ranges(connections_path, chunks or workers * 4)
+
+    degrees: Counter = Counter()
+    components = ComponentTracker()
+    edges = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = pool.map(scan_connections, *zip(*[(connections_path, start, end) for start, end in ranges]))
+        for partial_degrees, forest, partial_edges in partials:
+            degrees.update(partial_degrees)
+            for node, root in forest.items():
+                components.union(node, root)
+            edges += partial_edges
+
+    if users_path:
+        with open(users_path, encoding="utf-8") as source:
+            for line in source:
+                line = line.strip()
+                if line:
+                    components.add_user(str(json.loads(line)["id"]))
+
+    # Users without connections only appear in users.ndjson
+    values = sorted(degrees.get(user_id, 0) for user_id in components.parent)
+    sizes = sorted(components.size.values(), reverse=True)
+    elapsed = time.monotonic() - started
+    return {
+        "users": len(values),
+        "connections": edges,
+        "degree": {
+            "min": values[0] if values else 0,
+            "max": values[-1] if values else 0,
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+            "median": percentile(values, 0.5),
+            "p90": percentile(values, 0.9),
+            "p99": percentile(values, 0.99),
+            "distribution": dict(sorted(Counter(values).items())),
+        },
+        "components": {
+            "count": len(sizes),
+            "largest": sizes[:largest],
+            "largest_share": round(sizes[0] / len(values), 4) if sizes else 0.0,
+            "size_histogram": dict(sorted(Counter(sizes).items())),
+        },
+        "workers": workers,
+        "chunks": len(ranges),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+# Write the current graph from Neo4j out as a snapshot in the layout above
+async def export_snapshot(connections_path: str, users_path: Optional[str] = None) -> dict:
+    load_dotenv()
+    driver = create_driver()
+    report = {"users": 0, "connections": 0}
+    try:
+        async with driver.session() as session:
+            if users_path:
+                with open(users_path, "w", encoding="utf-8") as users_file:
+                    result = await session.run(LOAD_USERS_QUERY)
+                    async for record in result:
+                        users_file.write(json.dumps({"id": record["id"]}) + "\n")
+                        report["users"] += 1
+            with open(connections_path, "w", encoding="utf-8") as connections_file:
+                result = await session.run(LOAD_EDGES_QUERY)
+                async for record in result:
+                    connections_file.write(json.dumps({"user1": record["source"], "user2": record["target"]}) + "\n")
+                    report["connections"] += 1
+    finally:
+        await driver.close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Degree distribution and component histogram of a graph snapshot")
+    parser.add_argument("connections", help="connections NDJSON file (bulk import layout)")
+    parser.add_argument("--users", help="users NDJSON file, to count users with no connections")
+    parser.add_argument("--export", action="store_true", help="first write the snapshot from Neo4j to these paths")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to the CPU count)")
+    parser.add_argument("--chunks", type=int, help="byte ranges to split the file into (defaults to 4 per worker)")
+    parser.add_argument("--largest", type=int, default=10, help="how many of the largest component sizes to list")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.export:
+        exported = asyncio.run(export_snapshot(args.connections, args.users))
+        print(f"Exported {exported['users']} users and {exported['connections']} connections")
+
+    report = compute_stats(args.connections, args.users, args.workers, args.chunks, args.largest)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
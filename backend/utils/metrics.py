@@ -0,0 +1,236 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Opt-in: run every instrumented query under PROFILE so db hits are recorded,
+# and print the plan of any query slower than SLOW_QUERY_MS
+QUERY_PROFILE = os.getenv("QUERY_PROFILE", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+# A query string that carries a name for metrics. Behaves exactly like str,
+# so it can be passed to tx.run as is.
+class NamedQuery(str):
+    name = "unnamed"
+
+def named_query(name: str, text: str) -> NamedQuery:
+    query = NamedQuery(text)
+    query.name = name
+    return query
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, metric: str, labels: str) -> list:
+        lines = []
+        prefix = f"{labels}," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{metric}_sum{suffix} {self.sum}")
+        lines.append(f"{metric}_count{suffix} {self.count}")
+        return lines
+
+# Per-request tally of database round trips, carried in a context variable
+class RequestStats:
+    def __init__(self):
+        self.round_trips = 0
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Process-wide metrics registry, rendered in Prometheus text format
+class Metrics:
+    def __init__(self):
+        self.query_latency: Dict[str, Histogram] = {}
+        self.query_rows: Dict[str, int] = {}
+        self.query_db_hits: Dict[str, int] = {}
+        self.query_errors: Dict[str, int] = {}
+        self.request_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_round_trips: Dict[Tuple[str, str], Histogram] = {}
+        self.session_acquire = Histogram(LATENCY_BUCKETS)
+        self.sessions_in_use = 0
+        self.sessions_opened = 0
+        self.gauges: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    def observe_query(self, name: str, seconds: float, rows: int, db_hits: Optional[int]):
+        self.query_latency.setdefault(name, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.query_rows[name] = self.query_rows.get(name, 0) + rows
+        if db_hits is not None:
+            self.query_db_hits[name] = self.query_db_hits.get(name, 0) + db_hits
+        stats = current_request.get()
+        if stats is not None:
+            stats.round_trips += 1
+
+    def observe_query_error(self, name: str):
+        self.query_errors[name] = self.query_errors.get(name, 0) + 1
+        stats = current_request.get()
+        if stats is not None:
+            stats.round_trips += 1
+
+    def observe_request(self, method: str, route: str, seconds: float, round_trips: int):
+        key = (method, route)
+        self.request_latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.request_round_trips.setdefault(key, Histogram(ROUND_TRIP_BUCKETS)).observe(round_trips)
+
+    # Free-form gauges/counters other modules publish (e.g. pool size, queue depth)
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def increment(self, name: str, amount: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def render(self) -> str:
+        lines = [
+            "# HELP connect3_query_duration_seconds Latency of named Neo4j queries",
+            "# TYPE connect3_query_duration_seconds histogram",
+        ]
+        for name, histogram in sorted(self.query_latency.items()):
+            lines += histogram.render("connect3_query_duration_seconds", f'query="{escape_label(name)}"')
+
+        lines += ["# HELP connect3_query_rows_total Rows returned by named queries",
+                  "# TYPE connect3_query_rows_total counter"]
+        lines += [f'connect3_query_rows_total{{query="{escape_label(name)}"}} {rows}'
+                  for name, rows in sorted(self.query_rows.items())]
+
+        lines += ["# HELP connect3_query_db_hits_total Database hits of named queries (recorded when QUERY_PROFILE is on)",
+                  "# TYPE connect3_query_db_hits_total counter"]
+        lines += [f'connect3_query_db_hits_total{{query="{escape_label(name)}"}} {hits}'
+                  for name, hits in sorted(self.query_db_hits.items())]
+
+        lines += ["# HELP connect3_query_errors_total Failed executions of named queries",
+                  "# TYPE connect3_query_errors_total counter"]
+        lines += [f'connect3_query_errors_total{{query="{escape_label(name)}"}} {errors}'
+                  for name, errors in sorted(self.query_errors.items())]
+
+        lines += ["# HELP connect3_http_request_duration_seconds HTTP request latency by route",
+                  "# TYPE connect3_http_request_duration_seconds histogram"]
+        for (method, route), histogram in sorted(self.request_latency.items()):
+            lines += histogram.render("connect3_http_request_duration_seconds",
+                                      f'method="{method}",route="{escape_label(route)}"')
+
+        lines += ["# HELP connect3_http_request_db_round_trips Database round trips per HTTP request",
+                  "# TYPE connect3_http_request_db_round_trips histogram"]
+        for (method, route), histogram in sorted(self.request_round_trips.items()):
+            lines += histogram.render("connect3_http_request_db_round_trips",
+                                      f'method="{method}",route="{escape_label(route)}"')
+
+        lines += ["# HELP connect3_session_acquire_seconds Wait between requesting a transaction and it starting (pool acquisition + BEGIN)",
+                  "# TYPE connect3_session_acquire_seconds histogram"]
+        lines += self.session_acquire.render("connect3_session_acquire_seconds", "")
+
+        lines += ["# HELP connect3_sessions_in_use Neo4j sessions currently open by request handlers",
+                  "# TYPE connect3_sessions_in_use gauge",
+                  f"connect3_sessions_in_use {self.sessions_in_use}",
+                  "# HELP connect3_sessions_opened_total Neo4j sessions opened by request handlers",
+                  "# TYPE connect3_sessions_opened_total counter",
+                  f"connect3_sessions_opened_total {self.sessions_opened}"]
+
+        for name, value in sorted(self.gauges.items()):
+            lines += [f"# TYPE connect3_{name} gauge", f"connect3_{name} {value}"]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE connect3_{name}_total counter", f"connect3_{name}_total {value}"]
+
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# Sum db hits over a PROFILE plan tree
+def total_db_hits(profile: Optional[dict]) -> Optional[int]:
+    if not profile:
+        return None
+    return profile.get("dbHits", 0) + sum(total_db_hits(child) or 0 for child in profile.get("children", []))
+
+# Execute a query inside a transaction and record its latency, rows and db hits.
+# collect is "single" or "all"; returns the record (or None) / the list of records.
+async def run_instrumented(tx, query: str, params: dict, collect: str):
+    name = getattr(query, "name", "unnamed")
+    text = f"PROFILE {query}" if QUERY_PROFILE else query
+    started = time.perf_counter()
+    try:
+        result = await tx.run(text, **params)
+        if collect == "single":
+            value = await result.single()
+            rows = 1 if value is not None else 0
+        else:
+            value = [record async for record in result]
+            rows = len(value)
+        summary = await result.consume()
+    except Exception:
+        metrics.observe_query_error(name)
+        raise
+    elapsed = time.perf_counter() - started
+
+    profile = summary.profile if QUERY_PROFILE else None
+    metrics.observe_query(name, elapsed, rows, total_db_hits(profile))
+    if QUERY_PROFILE and elapsed * 1000 >= SLOW_QUERY_MS:
+        print(f"Slow query {name}: {elapsed * 1000:.1f} ms, {rows} rows, "
+              f"{total_db_hits(profile)} db hits\nPlan: {profile}")
+    return value
+
+# Wrap a session so each managed transaction records how long it waited to start
+# (connection acquisition from the pool plus BEGIN) before its work ran
+class InstrumentedSession:
+    def __init__(self, session):
+        self.session = session
+
+    async def execute_read(self, work, *args, **kwargs):
+        return await self.session.execute_read(self.timed(work), *args, **kwargs)
+
+    async def execute_write(self, work, *args, **kwargs):
+        return await self.session.execute_write(self.timed(work), *args, **kwargs)
+
+    def timed(self, work):
+        requested = time.perf_counter()
+        first_attempt = True
+
+        async def timed_work(tx, *args, **kwargs):
+            nonlocal first_attempt
+            if first_attempt:
+                metrics.session_acquire.observe(time.perf_counter() - requested)
+                first_attempt = False
+            return await work(tx, *args, **kwargs)
+        return timed_work
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+# ASGI middleware: time each HTTP request and count the database round trips it made
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            metrics.observe_request(scope.get("method", ""), route_path, time.perf_counter() - started, stats.round_trips)
+            current_request.reset(token)
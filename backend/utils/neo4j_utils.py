@@ -1,6 +1,7 @@
 from neo4j import GraphDatabase
 import os
 from dotenv import load_dotenv
+from utils.metrics import run_instrumented
 
 load_dotenv()
 # ENV variables
@@ -22,5 +23,17 @@ def main():
     finally:
         driver.close()
 
+# Managed transaction work functions, for use with
+# session.execute_read(...) / session.execute_write(...).
+# Queries built with utils.metrics.named_query are timed under their name.
+
+# Run a query and return its single record (or None)
+async def fetch_single(tx, query, **params):
+    return await run_instrumented(tx, query, params, "single")
+
+# Run a query and return all of its records
+async def fetch_all(tx, query, **params):
+    return await run_instrumented(tx, query, params, "all")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,97 @@
+import hashlib
+from typing import Awaitable, Callable, Dict, List
+
+from utils.neo4j_utils import fetch_all
+from utils.metrics import named_query
+
+DEFAULT_NETWORK_NODES = 500
+MAX_NETWORK_NODES = 5000
+
+NEIGHBORS_QUERY = named_query("network_neighbors", """
+UNWIND $frontier AS source_id
+MATCH (:User {id: source_id})-[:CONNECTED_TO]->(neighbor:User)
+RETURN source_id, neighbor.id AS id
+""")
+
+NAMES_QUERY = named_query("network_names", """
+UNWIND $ids AS user_id
+MATCH (u:User {id: user_id})
+RETURN u.id AS id, u.name AS name
+""")
+
+# Neighbor lists for a frontier, one round trip
+async def neighbors_from_db(session, frontier: List[str]) -> Dict[str, List[str]]:
+    records = await session.execute_read(fetch_all, NEIGHBORS_QUERY, frontier=frontier)
+    adjacency = {}
+    for record in records:
+        adjacency.setdefault(record["source_id"], []).append(record["id"])
+    return adjacency
+
+async def names_from_db(session, ids: List[str]) -> Dict[str, str]:
+    records = await session.execute_read(fetch_all, NAMES_QUERY, ids=ids)
+    return {record["id"]: record["name"] for record in records}
+
+# Stable pseudo-random rank for a user, so sampling is the same on every request
+def sample_rank(user_id: str, seed: int) -> bytes:
+    return hashlib.blake2b(f"{seed}:{user_id}".encode(), digest_size=8).digest()
+
+# Expand the ego network of root level by level, yielding one compact chunk per hop:
+#   {"hop": d, "nodes": [{"index", "id", "name", "hop"}], "edges": [[i, j], ...], "sampled": bool}
+# Node indexes are global across chunks and edges refer to them (i < j, each edge once).
+# Once max_nodes is reached, each new level is cut down to a deterministic sample.
+async def expand_network(neighbors: Callable[[List[str]], Awaitable[Dict[str, List[str]]]],
+                         names: Callable[[List[str]], Awaitable[Dict[str, str]]],
+                         root: str, depth: int, max_nodes: int = DEFAULT_NETWORK_NODES, seed: int = 0):
+    index = {root: 0}
+    seen_edges = set()
+    root_names = await names([root])
+    yield {
+        "hop": 0,
+        "nodes": [{"index": 0, "id": root, "name": root_names.get(root), "hop": 0}],
+        "edges": [],
+        "sampled": False,
+    }
+
+    frontier = [root]
+    for hop in range(1, depth + 2):
+        if not frontier:
+            break
+        adjacency = await neighbors(frontier)
+
+        # The extra pass after the last hop only collects edges among the outermost level
+        new_ids = []
+        sampled = False
+        if hop <= depth:
+            new_ids = sorted({
+                neighbor_id
+                for source_id in frontier
+                for neighbor_id in adjacency.get(source_id, [])
+                if neighbor_id not in index
+            })
+            remaining = max_nodes - len(index)
+            if len(new_ids) > remaining:
+                new_ids = sorted(new_ids, key=lambda user_id: sample_rank(user_id, seed))[:max(remaining, 0)]
+                sampled = True
+            for user_id in new_ids:
+                index[user_id] = len(index)
+
+        edges = []
+        for source_id in frontier:
+            for neighbor_id in adjacency.get(source_id, []):
+                if neighbor_id in index:
+                    edge = tuple(sorted((index[source_id], index[neighbor_id])))
+                    if edge[0] != edge[1] and edge not in seen_edges:
+                        seen_edges.add(edge)
+                        edges.append(list(edge))
+
+        level_names = await names(new_ids) if new_ids else {}
+        yield {
+            "hop": min(hop, depth),
+            "nodes": [
+                {"index": index[user_id], "id": user_id, "name": level_names.get(user_id), "hop": hop}
+                for user_id in new_ids
+            ],
+            "edges": edges,
+            "sampled": sampled,
+        }
+        frontier = new_ids
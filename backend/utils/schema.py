@@ -0,0 +1,59 @@
+from neo4j.exceptions import Neo4jError
+
+# Constraints and indexes the app relies on, keyed by name.
+# Every statement is idempotent (IF NOT EXISTS), so this is safe to run on every startup.
+SCHEMA_STATEMENTS = {
+    # Point lookups by id / email, and database-enforced duplicate checks
+    "user_id_unique": "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "user_email_unique": "CREATE CONSTRAINT user_email_unique IF NOT EXISTS FOR (u:User) REQUIRE u.email IS UNIQUE",
+    # Lookups by name (connect_users_by_name)
+    "user_name_index": "CREATE INDEX user_name_index IF NOT EXISTS FOR (u:User) ON (u.name)",
+    # Typeahead search on names and emails (GET /users/search without the in-process index)
+    "user_search": "CREATE FULLTEXT INDEX user_search IF NOT EXISTS FOR (u:User) ON EACH [u.name, u.email]",
+    # Post lookups by id
+    "post_id_index": "CREATE INDEX post_id_index IF NOT EXISTS FOR (p:Post) ON (p.id)",
+    # Feed ordering and ?before= paging
+    "post_timestamp_index": "CREATE RANGE INDEX post_timestamp_index IF NOT EXISTS FOR (p:Post) ON (p.timestamp)",
+    # Lets the feed read the widest visibility degree in use from the index instead of scanning posts
+    "post_visibility_index": "CREATE RANGE INDEX post_visibility_index IF NOT EXISTS FOR (p:Post) ON (p.visibility_degree)",
+}
+
+# Create any missing constraints and indexes.
+# A statement that fails (e.g. a uniqueness constraint over existing duplicates)
+# is reported rather than aborting startup.
+async def ensure_schema(driver) -> dict:
+    applied = []
+    failed = {}
+    async with driver.session() as session:
+        for name, statement in SCHEMA_STATEMENTS.items():
+            try:
+                result = await session.run(statement)
+                await result.consume()
+                applied.append(name)
+            except Neo4jError as e:
+                failed[name] = e.message or str(e)
+    return {"applied": applied, "failed": failed}
+
+# Report the constraints and indexes currently present in the database
+async def describe_schema(driver) -> dict:
+    async with driver.session() as session:
+        result = await session.run("""
+        SHOW CONSTRAINTS
+        YIELD name, type, entityType, labelsOrTypes, properties
+        RETURN name, type, entityType, labelsOrTypes, properties
+        """)
+        constraints = [record.data() async for record in result]
+
+        result = await session.run("""
+        SHOW INDEXES
+        YIELD name, type, entityType, labelsOrTypes, properties, state, owningConstraint
+        RETURN name, type, entityType, labelsOrTypes, properties, state, owningConstraint
+        """)
+        indexes = [record.data() async for record in result]
+
+    present = {item["name"] for item in constraints} | {item["name"] for item in indexes}
+    return {
+        "constraints": constraints,
+        "indexes": indexes,
+        "missing": [name for name in SCHEMA_STATEMENTS if name not in present],
+    }
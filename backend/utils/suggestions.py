@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import os
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from utils.graph_index import GraphIndex, run_in_worker
+
+# "People you may know": ranked by mutual connections, then by how close the
+# candidate's school_year is. Needs the graph index (GRAPH_INDEX_ENABLED).
+SUGGESTIONS_ENABLED = os.getenv("SUGGESTIONS_ENABLED", "false").lower() in ("1", "true", "yes")
+SUGGESTIONS_TOP_K = int(os.getenv("SUGGESTIONS_TOP_K", "50"))
+# Edges whose endpoints have more connections than this are not patched in
+# place (that would be a large intersection sweep); the next rebuild catches them
+SUGGESTIONS_PATCH_MAX_DEGREE = int(os.getenv("SUGGESTIONS_PATCH_MAX_DEGREE", "2000"))
+# Full rebuilds, on their own schedule: add_edge keeps the lists current in
+# between, so they only catch skipped patches and edges written elsewhere
+SUGGESTIONS_REBUILD_SECONDS = float(os.getenv("SUGGESTIONS_REBUILD_SECONDS", "3600"))
+
+LOAD_SCHOOL_YEARS_QUERY = """
+MATCH (u:User)
+RETURN u.id AS id, u.school_year AS school_year
+"""
+
+# Users whose school year is unknown sort after every known year difference
+UNKNOWN_YEAR_GAP = 100
+
+# Longest the event loop is held at a time while a rebuild's result is unpacked
+UNPACK_SLICE_SECONDS = 0.005
+
+# Precomputed top-k suggestion lists, keyed by user id.
+# Each list holds (candidate_id, mutual_count) pairs, best first.
+class SuggestionIndex:
+    def __init__(self, top_k: int = SUGGESTIONS_TOP_K):
+        self.top_k = top_k
+        self.top: Dict[str, List[Tuple[str, int]]] = {}
+        self.school_years: Dict[str, Optional[int]] = {}
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.patched_edges = 0
+        self.skipped_patches = 0
+        self.building = False
+        self.replay: List[tuple] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def year_gap(self, user_id: str, candidate_id: str) -> int:
+        user_year = self.school_years.get(user_id)
+        candidate_year = self.school_years.get(candidate_id)
+        if user_year is None or candidate_year is None:
+            return UNKNOWN_YEAR_GAP
+        return abs(user_year - candidate_year)
+
+    def rank_key(self, user_id: str, candidate_id: str, mutual: int):
+        return (-mutual, self.year_gap(user_id, candidate_id), candidate_id)
+
+    # Best top_k candidates for one user from its {candidate: mutual} counts
+    def select(self, user_id: str, counts: Dict[str, int]) -> List[Tuple[str, int]]:
+        best = heapq.nsmallest(
+            self.top_k, counts.items(), key=lambda item: self.rank_key(user_id, item[0], item[1])
+        )
+        return [(candidate_id, mutual) for candidate_id, mutual in best]
+
+    # Recompute every list from the graph index adjacency. For each user, mutual
+    # counts are tallied by walking its neighbors' neighbor lists (one pass over
+    # the two-hop neighborhood in the flat CSR arrays), skipping itself and
+    # existing connections. A rebuild already running is left to finish.
+    async def rebuild(self, index: GraphIndex, driver):
+        if self.building:
+            return
+        self.building = True
+        self.replay = []
+        try:
+            await self.compute(index, driver)
+        finally:
+            self.building = False
+        # Edges added while the lists were being computed are patched onto the new ones
+        replay, self.replay = self.replay, []
+        for user1_id, user2_id in replay:
+            self.add_edge(index, user1_id, user2_id)
+
+    async def compute(self, index: GraphIndex, driver):
+        started = time.perf_counter()
+        school_years = {}
+        async with driver.session() as session:
+            result = await session.run(LOAD_SCHOOL_YEARS_QUERY)
+            async for record in result:
+                school_years[record["id"]] = record["school_year"]
+        self.school_years = school_years
+
+        # The two-hop pass is pure CPU: it runs in a worker process over a snapshot of
+        # the index so the event loop keeps serving requests. It returns flat arrays
+        # of positions (cheap to pass back), unpacked here into lists keyed by user id,
+        # which stay valid if the index is reloaded meanwhile.
+        snapshot = index.snapshot()
+        users, offsets, candidates, mutuals = await run_in_worker(rank_all, snapshot, school_years, self.top_k)
+        ids = snapshot.ids
+        top = {}
+        slice_started = time.perf_counter()
+        for row, position in enumerate(users):
+            top[ids[position]] = [(ids[candidates[entry]], mutuals[entry]) for entry in range(offsets[row], offsets[row + 1])]
+            if time.perf_counter() - slice_started > UNPACK_SLICE_SECONDS:
+                await asyncio.sleep(0)
+                slice_started = time.perf_counter()
+
+        self.top = top
+        self.built_at = time.time()
+        self.build_seconds = round(time.perf_counter() - started, 3)
+        self.patched_edges = 0
+        self.skipped_patches = 0
+
+    def add_user(self, user_id: str, school_year: Optional[int]):
+        self.school_years[str(user_id)] = school_year
+
+    def suggestions(self, user_id: str, limit: int) -> List[Tuple[str, int]]:
+        return self.top.get(str(user_id), [])[:limit]
+
+    # Put candidate_id in user_id's list with an exact mutual count, keeping it sorted and capped
+    def offer(self, user_id: str, candidate_id: str, mutual: int):
+        entries = [entry for entry in self.top.get(user_id, []) if entry[0] != candidate_id]
+        entries.append((candidate_id, mutual))
+        entries.sort(key=lambda entry: self.rank_key(user_id, entry[0], entry[1]))
+        self.top[user_id] = entries[:self.top_k]
+
+    def discard(self, user_id: str, candidate_id: str):
+        entries = self.top.get(user_id)
+        if entries:
+            self.top[user_id] = [entry for entry in entries if entry[0] != candidate_id]
+
+    # Patch the lists after user1 and user2 connect (call after the graph index has the edge).
+    # The pair stops being a suggestion, and each neighbor of one endpoint gains the
+    # other endpoint as a candidate with one more mutual connection; that pair's exact
+    # count is recomputed by intersecting the two neighbor sets.
+    def add_edge(self, index: GraphIndex, user1_id: str, user2_id: str):
+        user1_id, user2_id = str(user1_id), str(user2_id)
+        if self.building:
+            self.replay.append((user1_id, user2_id))
+        if not self.ready:
+            return
+        first, second = index.positions.get(user1_id), index.positions.get(user2_id)
+        if first is None or second is None:
+            return
+        if max(index.degree(first), index.degree(second)) > SUGGESTIONS_PATCH_MAX_DEGREE:
+            self.skipped_patches += 1
+            return
+
+        self.discard(user1_id, user2_id)
+        self.discard(user2_id, user1_id)
+
+        for endpoint, other in ((first, second), (second, first)):
+            other_neighbors = set(index.neighbors(other))
+            other_id = index.ids[other]
+            for neighbor in index.neighbors(endpoint):
+                if neighbor == other or neighbor in other_neighbors:
+                    continue
+                mutual = len(other_neighbors.intersection(index.neighbors(neighbor)))
+                neighbor_id = index.ids[neighbor]
+                self.offer(neighbor_id, other_id, mutual)
+                self.offer(other_id, neighbor_id, mutual)
+        self.patched_edges += 1
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "users_with_suggestions": len(self.top),
+            "top_k": self.top_k,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "patched_edges": self.patched_edges,
+            "skipped_patches": self.skipped_patches,
+        }
+
+# Worker: top lists for every user of a (snapshot) index, in CSR form by position:
+# users[row] has candidates[offsets[row]:offsets[row + 1]] with those mutual counts
+def rank_all(index: GraphIndex, school_years: Dict[str, Optional[int]], top_k: int):
+    ranker = SuggestionIndex(top_k)
+    ranker.school_years = school_years
+    ids = index.ids
+    users, offsets, candidates, mutuals = array("i"), array("q", [0]), array("i"), array("i")
+    for position in range(len(ids)):
+        direct = set(index.neighbors(position))
+        counts: Dict[int, int] = {}
+        for neighbor in direct:
+            for candidate in index.neighbors(neighbor):
+                if candidate != position and candidate not in direct:
+                    counts[candidate] = counts.get(candidate, 0) + 1
+        if counts:
+            best = ranker.select(ids[position], {ids[candidate]: mutual for candidate, mutual in counts.items()})
+            by_id = {ids[candidate]: candidate for candidate in counts}
+            users.append(position)
+            candidates.extend(by_id[candidate_id] for candidate_id, _ in best)
+            mutuals.extend(mutual for _, mutual in best)
+            offsets.append(len(candidates))
+    return users, offsets, candidates, mutuals
+
+# Background task: rebuild the lists every interval seconds
+async def refresh_periodically(suggestions: SuggestionIndex, index: GraphIndex, driver,
+                               interval: float = SUGGESTIONS_REBUILD_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        if not index.ready:
+            continue
+        try:
+            await suggestions.rebuild(index, driver)
+        except Exception as e:
+            print(f"Failed to rebuild suggestions: {str(e)}")
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import time
+from bisect import insort
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Optional fan-out-on-write feed mode
+FEED_FANOUT_ENABLED = os.getenv("FEED_FANOUT_ENABLED", "false").lower() in ("1", "true", "yes")
+# Posts kept per user timeline (oldest are dropped first)
+TIMELINE_MAX_POSTS = int(os.getenv("TIMELINE_MAX_POSTS", "500"))
+# Posts whose audience is larger than this are not fanned out; they are merged in at read time
+FANOUT_MAX_AUDIENCE = int(os.getenv("FANOUT_MAX_AUDIENCE", "5000"))
+# Newest posts replayed by a rebuild
+TIMELINE_REBUILD_POSTS = int(os.getenv("TIMELINE_REBUILD_POSTS", "50000"))
+# Periodic rebuilds pick up posts written by other workers or by offline imports,
+# which never pass through this process's fan_out
+TIMELINE_REFRESH_SECONDS = float(os.getenv("TIMELINE_REFRESH_SECONDS", "300"))
+
+def timestamp_key(timestamp: datetime) -> float:
+    return timestamp.timestamp()
+
+# Is a (timestamp key, post id) entry past the keyset cursor (before, before_id)?
+# Without before_id every post at exactly before is excluded.
+def older_than(key: float, post_id: str, before: Optional[datetime], before_id: Optional[str]) -> bool:
+    if before is None:
+        return True
+    cutoff = timestamp_key(before)
+    return key < cutoff or (before_id is not None and key == cutoff and post_id < before_id)
+
+# Materialized feeds: for every user, a bounded list of (timestamp, post id)
+# kept in ascending time order, filled when a post is created.
+# Wide posts (audience over max_audience) are kept once in a shared list and
+# filtered against the viewer's neighborhood at read time instead.
+class TimelineStore:
+    def __init__(self, max_posts: int = TIMELINE_MAX_POSTS, max_audience: int = FANOUT_MAX_AUDIENCE):
+        self.max_posts = max_posts
+        self.max_audience = max_audience
+        self.timelines: Dict[str, List[tuple]] = {}
+        self.wide_posts: List[tuple] = []
+        self.rebuilt_at: Optional[float] = None
+        self.fanouts = 0
+        self.fanout_deliveries = 0
+        self.wide_fallbacks = 0
+        self.rebuilding = False
+        self.replay: List[tuple] = []
+        # Bumped by invalidate; timelines are only served when built at the current generation
+        self.generation = 0
+        self.built_generation = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.rebuilt_at is not None and self.built_generation == self.generation
+
+    # Stop serving the timelines until the next rebuild that starts after this call,
+    # e.g. when an import wrote posts or connections that bypassed fan_out
+    def invalidate(self):
+        self.generation += 1
+
+    # Deliver a post to every user in its audience, or record it as a wide post.
+    # Returns False when the audience is over the cap.
+    def fan_out(self, post_id: str, author_id: str, visibility_degree: int,
+                timestamp: datetime, audience: Optional[Iterable[str]]) -> bool:
+        if self.rebuilding:
+            self.replay.append((post_id, author_id, visibility_degree, timestamp, audience))
+        key = timestamp_key(timestamp)
+        audience = list(audience) if audience is not None else None
+        if audience is None or len(audience) > self.max_audience:
+            insort(self.wide_posts, (key, post_id, str(author_id), visibility_degree))
+            if len(self.wide_posts) > self.max_posts:
+                del self.wide_posts[0]
+            self.wide_fallbacks += 1
+            return False
+
+        for user_id in audience:
+            timeline = self.timelines.setdefault(user_id, [])
+            insort(timeline, (key, post_id))
+            if len(timeline) > self.max_posts:
+                del timeline[0]
+        self.fanouts += 1
+        self.fanout_deliveries += len(audience)
+        return True
+
+    # Newest-first (timestamp, post id) entries of a user's timeline, past the (before, before_id) cursor
+    def read(self, user_id: str, limit: int, before: Optional[datetime] = None,
+             before_id: Optional[str] = None) -> List[tuple]:
+        timeline = self.timelines.get(str(user_id), [])
+        entries = []
+        for key, post_id in reversed(timeline):
+            if not older_than(key, post_id, before, before_id):
+                continue
+            entries.append((key, post_id))
+            if len(entries) >= limit:
+                break
+        return entries
+
+    # Newest-first wide posts past the cursor: (timestamp, post id, author id, visibility degree)
+    def read_wide(self, limit: int, before: Optional[datetime] = None, before_id: Optional[str] = None) -> List[tuple]:
+        return [
+            entry for entry in reversed(self.wide_posts)
+            if older_than(entry[0], entry[1], before, before_id)
+        ][:limit]
+
+    # Recompute every timeline from scratch, e.g. after new connections changed who can see what.
+    # posts are dicts (id, author_id, visibility_degree, timestamp); audience_for(author_id, degree)
+    # returns the user ids within reach, or None when over the cap. Posts fanned out while the
+    # rebuild runs are replayed onto the new timelines. generation is self.generation as it
+    # was before posts were read (defaults to the current one).
+    async def rebuild(self, posts: Iterable[dict],
+                      audience_for: Callable[[str, int], Awaitable[Optional[List[str]]]],
+                      generation: Optional[int] = None):
+        generation = self.generation if generation is None else generation
+        self.rebuilding = True
+        self.replay = []
+        rebuilt_ids = set()
+        try:
+            fresh = TimelineStore(self.max_posts, self.max_audience)
+            for post in posts:
+                audience = await audience_for(post["author_id"], post["visibility_degree"])
+                fresh.fan_out(post["id"], post["author_id"], post["visibility_degree"], post["timestamp"], audience)
+                rebuilt_ids.add(post["id"])
+            self.timelines, self.wide_posts = fresh.timelines, fresh.wide_posts
+            self.rebuilt_at = time.time()
+            self.built_generation = generation
+        finally:
+            self.rebuilding = False
+
+        replay, self.replay = self.replay, []
+        for post_id, author_id, visibility_degree, timestamp, audience in replay:
+            if post_id not in rebuilt_ids:
+                self.fan_out(post_id, author_id, visibility_degree, timestamp, audience)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "stale": self.rebuilt_at is not None and not self.ready,
+            "rebuilt_at": self.rebuilt_at,
+            "timelines": len(self.timelines),
+            "timeline_entries": sum(len(timeline) for timeline in self.timelines.values()),
+            "wide_posts": len(self.wide_posts),
+            "max_posts": self.max_posts,
+            "max_audience": self.max_audience,
+            "fanouts": self.fanouts,
+            "fanout_deliveries": self.fanout_deliveries,
+            "wide_fallbacks": self.wide_fallbacks,
+        }
+
+# Background task: rebuild the timelines every interval seconds
+async def refresh_periodically(rebuild: Callable[[], Awaitable], interval: float = TIMELINE_REFRESH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await rebuild()
+        except Exception as e:
+            print(f"Failed to rebuild feed timelines: {str(e)}")
@@ -0,0 +1,115 @@
+import os
+import uuid
+from typing import Dict, List, Optional
+
+from utils.neo4j_utils import fetch_all
+from utils.metrics import named_query
+
+# Visibility and separation are never considered past six hops
+MAX_DEGREE = 6
+
+# CONNECTED_TO is always written in both directions, so walking the outgoing
+# edges from a frontier is enough to reach every neighbor exactly once
+EXPAND_FRONTIER_QUERY = named_query("expand_frontier", """
+UNWIND $frontier AS source_id
+MATCH (:User {id: source_id})-[:CONNECTED_TO]->(neighbor:User)
+RETURN DISTINCT neighbor.id AS id
+""")
+
+# Helper function to fetch the neighbors of every user in a frontier in one round trip
+async def expand_frontier(session, frontier: List[str]) -> List[str]:
+    records = await session.execute_read(fetch_all, EXPAND_FRONTIER_QUERY, frontier=frontier)
+    return [record["id"] for record in records]
+
+# Breadth-first expansion from a user, one query per hop.
+# Returns the hop distance of every user reached within max_depth (the start user is 0).
+# With max_nodes, expansion stops once more than max_nodes users have been reached.
+async def bfs_distances(session, user_id: uuid.UUID, max_depth: int, max_nodes: Optional[int] = None) -> Dict[str, int]:
+    start = str(user_id)
+    distances = {start: 0}
+    frontier = [start]
+    depth = 0
+
+    while frontier and depth < min(max_depth, MAX_DEGREE):
+        if max_nodes is not None and len(distances) > max_nodes:
+            break
+        depth += 1
+        next_frontier = []
+        for neighbor_id in await expand_frontier(session, frontier):
+            if neighbor_id not in distances:
+                distances[neighbor_id] = depth
+                next_frontier.append(neighbor_id)
+        frontier = next_frontier
+
+    return distances
+
+# Hard cap on users a single separation search may visit (both sides combined)
+SEPARATION_NODE_BUDGET = int(os.getenv("SEPARATION_NODE_BUDGET", "20000"))
+
+EXPAND_FRONTIER_EDGES_QUERY = named_query("expand_frontier_edges", """
+UNWIND $frontier AS source_id
+MATCH (:User {id: source_id})-[:CONNECTED_TO]->(neighbor:User)
+RETURN source_id, neighbor.id AS id
+LIMIT $limit
+""")
+
+# Expand one side of a bidirectional search by a full level.
+# visited maps user id -> (parent id, depth) for that side.
+# Returns the next frontier and whether the row limit cut the level short.
+async def expand_side(session, frontier: List[str], visited: Dict[str, tuple], depth: int, limit: int):
+    records = await session.execute_read(fetch_all, EXPAND_FRONTIER_EDGES_QUERY, frontier=frontier, limit=limit)
+    next_frontier = []
+    for record in records:
+        neighbor_id = record["id"]
+        if neighbor_id not in visited:
+            visited[neighbor_id] = (record["source_id"], depth)
+            next_frontier.append(neighbor_id)
+    return next_frontier, len(records) >= limit
+
+# Walk parent pointers back to the root of one side of the search
+def trace_path(visited: Dict[str, tuple], node_id: str) -> List[str]:
+    path = []
+    while node_id is not None:
+        path.append(node_id)
+        node_id = visited[node_id][0]
+    return path
+
+# Bidirectional BFS between two users, always expanding the smaller frontier.
+# Returns (path of user ids from source to target or None, whether the node budget cut the search short).
+async def bidirectional_search(session, source_id: uuid.UUID, target_id: uuid.UUID,
+                               max_depth: int = MAX_DEGREE, node_budget: int = SEPARATION_NODE_BUDGET):
+    source, target = str(source_id), str(target_id)
+    if source == target:
+        return [source], False
+
+    forward = {source: (None, 0)}
+    backward = {target: (None, 0)}
+    forward_frontier, backward_frontier = [source], [target]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier and forward_depth + backward_depth < max_depth:
+        remaining = node_budget - len(forward) - len(backward)
+        if remaining <= 0:
+            return None, True
+
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            forward_depth += 1
+            frontier, truncated = await expand_side(session, forward_frontier, forward, forward_depth, remaining)
+            forward_frontier, visited, other = frontier, forward, backward
+        else:
+            backward_depth += 1
+            frontier, truncated = await expand_side(session, backward_frontier, backward, backward_depth, remaining)
+            backward_frontier, visited, other = frontier, backward, forward
+
+        # Every meeting point found in this level is a candidate; keep the shortest
+        meetings = [node_id for node_id in frontier if node_id in other]
+        if meetings:
+            meeting = min(meetings, key=lambda node_id: visited[node_id][1] + other[node_id][1])
+            path = trace_path(forward, meeting)[::-1] + trace_path(backward, meeting)[1:]
+            return path, False
+
+        if truncated:
+            return None, True
+
+    return None, False
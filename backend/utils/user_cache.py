@@ -0,0 +1,95 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+# Bounded LRU + TTL cache of user records (the dicts built by user_to_dict),
+# addressable by id and by email. Writers invalidate the entries they touch;
+# the TTL bounds staleness across workers, which don't share a cache.
+class UserCache:
+    def __init__(self, max_entries: int = USER_CACHE_SIZE, ttl_seconds: float = USER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.email_ids = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_by_id(self, user_id) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        user_id = str(user_id)
+        entry = self.entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self.drop(user_id)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(user)
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        user_id = self.email_ids.get(email)
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def put(self, user: dict):
+        if not self.enabled:
+            return
+        user_id = str(user["id"])
+        self.drop(user_id)
+        self.entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self.email_ids[user["email"]] = user_id
+        while len(self.entries) > self.max_entries:
+            oldest_id = next(iter(self.entries))
+            self.drop(oldest_id)
+            self.evictions += 1
+
+    def drop(self, user_id: str):
+        entry = self.entries.pop(user_id, None)
+        if entry is not None and self.email_ids.get(entry[1]["email"]) == user_id:
+            del self.email_ids[entry[1]["email"]]
+
+    def invalidate(self, user_id=None, email: Optional[str] = None):
+        if user_id is not None and str(user_id) in self.entries:
+            self.drop(str(user_id))
+            self.invalidations += 1
+        if email is not None and email in self.email_ids:
+            self.drop(self.email_ids[email])
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.email_ids.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
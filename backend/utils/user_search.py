@@ -0,0 +1,216 @@
+import base64
+import json
+import os
+import re
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# Optional in-process typeahead index over user names and emails. When it is off,
+# search goes through the user_search full-text index in Neo4j instead.
+USER_SEARCH_INDEX_ENABLED = os.getenv("USER_SEARCH_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+# Most candidates ranked per query (before pagination)
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "500"))
+# Lowest trigram similarity accepted as a fuzzy match
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.3"))
+
+LOAD_USERS_QUERY = """
+MATCH (u:User)
+RETURN u.id AS id, u.name AS name, u.email AS email
+"""
+
+# Match tiers, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, FUZZY = 0, 1, 2, 3
+MATCH_TYPES = {EXACT: "exact", NAME_PREFIX: "prefix", WORD_PREFIX: "word_prefix", FUZZY: "fuzzy"}
+
+# Rank used for users with no known separation when ranking by it
+UNKNOWN_DISTANCE = 99
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+def words(name: str, email: str) -> List[str]:
+    return name.split() + [part for part in re.split(r"[^a-z0-9]+", email.split("@")[0]) if part]
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Trigram (Jaccard) similarity between two normalized strings
+def similarity(left: str, right: str) -> float:
+    left_grams, right_grams = trigrams(left), trigrams(right)
+    if not left_grams or not right_grams:
+        return 0.0
+    shared = len(left_grams & right_grams)
+    return shared / (len(left_grams) + len(right_grams) - shared)
+
+# Best match tier and similarity of a query against one user
+def classify(query: str, name: str, email: str) -> Tuple[int, float]:
+    if query in (name, email):
+        return EXACT, 1.0
+    if name.startswith(query) or email.startswith(query):
+        return NAME_PREFIX, 1.0
+    if any(word.startswith(query) for word in words(name, email)):
+        return WORD_PREFIX, 1.0
+    return FUZZY, max(similarity(query, name), similarity(query, email.split("@")[0]))
+
+# Opaque keyset cursor: the rank key of the last result on the previous page
+def encode_cursor(rank: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(rank)).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        rank = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid search cursor")
+    if not isinstance(rank, list) or len(rank) != 5:
+        raise ValueError("Invalid search cursor")
+    return tuple(rank)
+
+# Order candidates and cut one page after the cursor.
+# candidates are {"id", "name", "email", "tier", "similarity"} dicts; distances
+# (user id -> hops from the searcher) makes separation the second sort key.
+def rank_page(candidates: List[dict], limit: int, cursor: Optional[str] = None,
+              distances: Optional[Dict[str, Optional[int]]] = None) -> Tuple[List[dict], Optional[str]]:
+    ranked = []
+    for candidate in candidates:
+        distance = None
+        if distances is not None:
+            distance = distances.get(candidate["id"])
+        rank = (
+            candidate["tier"],
+            UNKNOWN_DISTANCE if distance is None else distance,
+            -round(candidate["similarity"], 4),
+            normalize(candidate["name"]),
+            candidate["id"],
+        )
+        ranked.append((rank, {
+            "id": candidate["id"],
+            "name": candidate["name"],
+            "email": candidate["email"],
+            "match": MATCH_TYPES[candidate["tier"]],
+            "distance": distance,
+        }))
+    ranked.sort(key=lambda entry: entry[0])
+
+    if cursor:
+        after = decode_cursor(cursor)
+        ranked = [entry for entry in ranked if entry[0] > after]
+    page = ranked[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(ranked) > limit else None
+    return [result for _, result in page], next_cursor
+
+# Sorted prefix keys (full name, each name word, email and its local part words)
+# plus a trigram posting list per user for fuzzy matches
+class UserSearchIndex:
+    def __init__(self):
+        self.users: Dict[str, Tuple[str, str, str, str]] = {}
+        self.keys: List[Tuple[str, str]] = []
+        self.grams: Dict[str, set] = {}
+        self.loaded_at: Optional[float] = None
+        self.loading = False
+        self.replay: List[tuple] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    def index_keys(self, name: str, email: str) -> set:
+        return {name, email, *words(name, email)}
+
+    # Add or update a user (e.g. from create_user). With keep_sorted=False the
+    # prefix keys are only appended, and the caller sorts them once at the end.
+    def add(self, user_id: str, name: Optional[str], email: Optional[str], keep_sorted: bool = True):
+        user_id = str(user_id)
+        if self.loading and keep_sorted:
+            self.replay.append((user_id, name, email))
+        if user_id in self.users:
+            self.remove(user_id)
+        normalized_name, normalized_email = normalize(name), normalize(email)
+        self.users[user_id] = (name or "", email or "", normalized_name, normalized_email)
+        for key in self.index_keys(normalized_name, normalized_email):
+            if keep_sorted:
+                insort(self.keys, (key, user_id))
+            else:
+                self.keys.append((key, user_id))
+        for gram in trigrams(normalized_name) | trigrams(normalized_email.split("@")[0]):
+            self.grams.setdefault(gram, set()).add(user_id)
+
+    def remove(self, user_id: str):
+        _, _, normalized_name, normalized_email = self.users.pop(user_id)
+        for key in self.index_keys(normalized_name, normalized_email):
+            position = bisect_left(self.keys, (key, user_id))
+            if position < len(self.keys) and self.keys[position] == (key, user_id):
+                del self.keys[position]
+        for gram in trigrams(normalized_name) | trigrams(normalized_email.split("@")[0]):
+            self.grams.get(gram, set()).discard(user_id)
+
+    # Up to max_candidates matches for a query: prefix matches first, then
+    # fuzzy matches found through shared trigrams
+    def candidates(self, query: str, max_candidates: int = SEARCH_MAX_CANDIDATES) -> List[dict]:
+        query = normalize(query)
+        if not query:
+            return []
+        found = {}
+        position = bisect_left(self.keys, (query, ""))
+        while position < len(self.keys) and len(found) < max_candidates:
+            key, user_id = self.keys[position]
+            if not key.startswith(query):
+                break
+            found.setdefault(user_id, None)
+            position += 1
+
+        if len(found) < max_candidates and len(query) >= 3:
+            shared: Dict[str, int] = {}
+            for gram in trigrams(query):
+                for user_id in self.grams.get(gram, ()):
+                    shared[user_id] = shared.get(user_id, 0) + 1
+            # Most shared trigrams first; exact similarity is checked in classify
+            for user_id, _ in sorted(shared.items(), key=lambda item: -item[1]):
+                if len(found) >= max_candidates:
+                    break
+                found.setdefault(user_id, None)
+
+        results = []
+        for user_id in found:
+            name, email, normalized_name, normalized_email = self.users[user_id]
+            tier, score = classify(query, normalized_name, normalized_email)
+            if tier == FUZZY and score < SEARCH_MIN_SIMILARITY:
+                continue
+            results.append({"id": user_id, "name": name, "email": email, "tier": tier, "similarity": score})
+        return results
+
+    # Rebuild from Neo4j into a fresh index and swap it in.
+    # Users added while the load is running are replayed onto the new one.
+    async def reload(self, driver):
+        self.loading = True
+        self.replay = []
+        try:
+            fresh = UserSearchIndex()
+            async with driver.session() as session:
+                result = await session.run(LOAD_USERS_QUERY)
+                async for record in result:
+                    fresh.add(record["id"], record["name"], record["email"], keep_sorted=False)
+            fresh.keys.sort()
+            self.users, self.keys, self.grams = fresh.users, fresh.keys, fresh.grams
+            self.loaded_at = time.time()
+        finally:
+            self.loading = False
+
+        replay, self.replay = self.replay, []
+        for user_id, name, email in replay:
+            self.add(user_id, name, email)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "users": len(self.users),
+            "prefix_keys": len(self.keys),
+            "trigrams": len(self.grams),
+            "loaded_at": self.loaded_at,
+        }
+
+# Lucene query for the user_search full-text index: every word as a prefix or a fuzzy term
+def fulltext_query(query: str) -> str:
+    terms = [re.sub(r'([+\-!(){}\[\]^"~*?:\\/&|])', r"\\\1", word) for word in normalize(query).split()]
+    return " AND ".join(f"({term}* OR {term}~)" for term in terms if term)
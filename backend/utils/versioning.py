@@ -0,0 +1,157 @@
+import os
+import secrets
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Iterable, Optional
+
+# Rendered response bodies kept for conditional GETs, by entry count and total size
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Versions also roll over after this long, which bounds staleness from changes
+# this process does not see (other workers, direct database writes, neighbors'
+# counters when the graph index is off)
+VERSION_TTL_SECONDS = float(os.getenv("VERSION_TTL_SECONDS", "60"))
+
+# Process-local version counters for what the connections and feed endpoints render.
+# Every bump takes the next value of one global sequence, so "has anything this
+# response depends on changed since seq N" is a single comparison. ETags carry a
+# random per-process token, so tags from another worker or a previous run never match.
+class VersionRegistry:
+    def __init__(self, max_emails: int = 100000):
+        self.token = secrets.token_hex(4)
+        self.seq = 0
+        self.started_at = time.time()
+        # user id -> (seq, unix time) of the last change
+        self.graph = {}
+        self.feed = {}
+        self.graph_epoch = (0, self.started_at)
+        self.feed_epoch = (0, self.started_at)
+        # email -> user id, learned from rendered responses
+        self.emails: OrderedDict = OrderedDict()
+        self.max_emails = max_emails
+
+    def next(self):
+        self.seq += 1
+        return self.seq, time.time()
+
+    # A user's connections (and counters) changed
+    def bump_graph(self, *user_ids):
+        stamp = self.next()
+        for user_id in user_ids:
+            self.graph[str(user_id)] = stamp
+
+    # Specific users' feeds changed (e.g. a post fanned out to them)
+    def bump_feeds(self, user_ids: Iterable):
+        stamp = self.next()
+        for user_id in user_ids:
+            self.feed[str(user_id)] = stamp
+
+    # Any feed may have changed (a new edge shifts who is within whose visibility)
+    def bump_all_feeds(self):
+        self.feed_epoch = self.next()
+        self.feed = {}
+
+    # Everything may have changed (bulk import)
+    def bump_all(self):
+        self.graph_epoch = self.next()
+        self.graph = {}
+        self.bump_all_feeds()
+
+    def graph_version(self, user_id: str):
+        if time.time() - self.graph_epoch[1] > VERSION_TTL_SECONDS:
+            self.graph_epoch = self.next()
+            self.graph = {}
+        return max(self.graph.get(str(user_id), self.graph_epoch), self.graph_epoch)
+
+    def feed_version(self, user_id: str):
+        if time.time() - self.feed_epoch[1] > VERSION_TTL_SECONDS:
+            self.bump_all_feeds()
+        # A connection change for the user changes whom their feed reaches as well
+        return max(self.feed.get(str(user_id), self.feed_epoch), self.feed_epoch, self.graph_version(user_id))
+
+    def learn_email(self, email: str, user_id: str):
+        self.emails[email] = str(user_id)
+        self.emails.move_to_end(email)
+        while len(self.emails) > self.max_emails:
+            self.emails.popitem(last=False)
+
+    def user_for_email(self, email: str) -> Optional[str]:
+        return self.emails.get(email)
+
+    def etag(self, kind: str, version, *parts) -> str:
+        suffix = "-".join(str(part) for part in parts if part is not None)
+        return f'W/"{kind}-{self.token}-{version[0]}{"-" + suffix if suffix else ""}"'
+
+    @staticmethod
+    def last_modified(version) -> str:
+        return formatdate(version[1], usegmt=True)
+
+# Does an If-None-Match header value match this ETag (weak comparison)?
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+# LRU of rendered JSON bodies keyed by ETag
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        # request key -> ETag of the last body cached for it
+        self.latest: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, etag: str) -> Optional[bytes]:
+        body = self.entries.get(etag)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(etag)
+        self.hits += 1
+        return body
+
+    def put(self, etag: str, body: bytes, key: Optional[str] = None):
+        if len(body) > self.max_bytes:
+            return
+        if key is not None:
+            self.latest[key] = etag
+            self.latest.move_to_end(key)
+            while len(self.latest) > self.max_entries:
+                self.latest.popitem(last=False)
+        if etag in self.entries:
+            self.bytes -= len(self.entries.pop(etag))
+        self.entries[etag] = body
+        self.bytes += len(body)
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    # Last body cached under a request key, whatever its version (possibly stale)
+    def get_latest(self, key: str) -> Optional[bytes]:
+        etag = self.latest.get(key)
+        return self.entries.get(etag) if etag is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,253 @@
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from utils.metrics import metrics, named_query
+from utils.neo4j_utils import fetch_all
+
+# Optional micro-batching of hot write paths (connects, signups with a connect, posts)
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_QUEUE_MAX_ITEMS = int(os.getenv("WRITE_QUEUE_MAX_ITEMS", "100"))
+WRITE_QUEUE_MAX_DELAY_MS = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "5"))
+
+# Batched form of CONNECT_USERS_QUERY: each row locks and resolves its pair, merges
+# both directions, and the counter increments of all new edges are summed per user
+# and applied with one SET each. Rows whose users do not exist return nothing.
+# Pairs must be unique within a batch (see connect_rows).
+CONNECT_USERS_BATCH_QUERY = """
+UNWIND $rows AS row
+CALL {{
+    WITH row
+    MATCH (u1:User {{{key}: row.user1}})
+    RETURN u1 LIMIT 1
+}}
+CALL {{
+    WITH row
+    MATCH (u2:User {{{key}: row.user2}})
+    RETURN u2 LIMIT 1
+}}
+SET u1.num_of_connections = coalesce(u1.num_of_connections, 0),
+    u2.num_of_connections = coalesce(u2.num_of_connections, 0)
+WITH row, u1, u2, EXISTS {{ (u1)-[:CONNECTED_TO]->(u2) }} AS already_connected
+MERGE (u1)-[:CONNECTED_TO]->(u2)
+MERGE (u2)-[:CONNECTED_TO]->(u1)
+WITH collect({{index: row.index, u1: u1, u2: u2, created: NOT already_connected}}) AS results
+CALL {{
+    WITH results
+    UNWIND [result IN results WHERE result.created] AS result
+    UNWIND [result.u1, result.u2] AS u
+    WITH u, count(*) AS increment
+    SET u.num_of_connections = u.num_of_connections + increment
+    RETURN count(u) AS updated
+}}
+UNWIND results AS result
+RETURN result.index AS index,
+       result.u1.id AS user1_id, result.u1.email AS user1_email,
+       result.u2.id AS user2_id, result.u2.email AS user2_email,
+       result.created AS created
+"""
+
+# Batched create_user_and_connect: new users are only created when their existing
+# user is found, and each existing user's counter is bumped once per batch
+CREATE_USERS_AND_CONNECT_BATCH_QUERY = named_query("create_users_and_connect_batch", """
+UNWIND $rows AS row
+CALL {
+    WITH row
+    MATCH (existing:User {id: row.existing_user_id})
+    RETURN existing LIMIT 1
+}
+CREATE (u:User {
+    id: row.id,
+    name: row.name,
+    email: row.email,
+    school_year: row.school_year,
+    num_of_connections: row.num_of_connections + 1,
+    invited_by: row.invited_by
+})
+MERGE (existing)-[:CONNECTED_TO]->(u)
+MERGE (u)-[:CONNECTED_TO]->(existing)
+WITH collect({index: row.index, u: u, existing: existing}) AS results
+CALL {
+    WITH results
+    UNWIND results AS result
+    WITH result.existing AS existing, count(*) AS increment
+    SET existing.num_of_connections = coalesce(existing.num_of_connections, 0) + increment
+    RETURN count(existing) AS updated
+}
+UNWIND results AS result
+RETURN result.index AS index, result.u AS u
+""")
+
+CREATE_POSTS_BATCH_QUERY = named_query("create_posts_batch", """
+UNWIND $rows AS row
+MATCH (u:User {id: row.author_id})
+CREATE (p:Post {
+    id: row.post_id,
+    content: row.content,
+    visibility_degree: row.visibility_degree,
+    timestamp: row.timestamp
+})-[:POSTED_BY]->(u)
+RETURN row.index AS index, p
+""")
+
+def connect_batch_query(key: str):
+    return named_query(f"connect_users_batch_by_{key}", CONNECT_USERS_BATCH_QUERY.format(key=key))
+
+# Give each distinct pair one row. A repeat of a pair (either order) in the same
+# batch shares that row's result but reports the edge as already existing.
+def connect_rows(items: List[dict]) -> Tuple[List[dict], List[Tuple[int, bool]]]:
+    rows = []
+    seen = {}
+    slots = []
+    for item in items:
+        pair = tuple(sorted((item["user1"], item["user2"])))
+        if pair in seen:
+            slots.append((seen[pair], True))
+            continue
+        seen[pair] = len(rows)
+        slots.append((len(rows), False))
+        rows.append({"index": len(rows), "user1": item["user1"], "user2": item["user2"]})
+    return rows, slots
+
+def connect_batch(key: str):
+    async def apply(session, items: List[dict]) -> List[Optional[dict]]:
+        rows, slots = connect_rows(items)
+        records = await session.execute_write(fetch_all, connect_batch_query(key), rows=rows)
+        connections = {record["index"]: record.data() for record in records}
+        results = []
+        for index, repeated in slots:
+            connection = connections.get(index)
+            if connection is not None and repeated:
+                connection = {**connection, "created": False}
+            results.append(connection)
+        return results
+    return apply
+
+# Items are create_user_and_connect parameters; results are the created User nodes (or None)
+async def create_users_and_connect_batch(session, items: List[dict]) -> List[Optional[Any]]:
+    rows = [{**item, "index": index} for index, item in enumerate(items)]
+    records = await session.execute_write(fetch_all, CREATE_USERS_AND_CONNECT_BATCH_QUERY, rows=rows)
+    users = {record["index"]: record["u"] for record in records}
+    return [users.get(index) for index in range(len(items))]
+
+# Items are create_post parameters; results are the created Post nodes (or None)
+async def create_posts_batch(session, items: List[dict]) -> List[Optional[Any]]:
+    rows = [{**item, "index": index} for index, item in enumerate(items)]
+    records = await session.execute_write(fetch_all, CREATE_POSTS_BATCH_QUERY, rows=rows)
+    posts = {record["index"]: record["p"] for record in records}
+    return [posts.get(index) for index in range(len(items))]
+
+# Collects submitted items for up to max_delay_ms (or until max_items are waiting)
+# and applies them with apply_batch in one write transaction. If the batch fails,
+# each item is retried alone with apply_one, so every caller gets its own result
+# or exception.
+class WriteBatcher:
+    def __init__(self, name: str, session_factory: Callable,
+                 apply_batch: Callable[[Any, List[Any]], Awaitable[List[Any]]],
+                 apply_one: Callable[[Any, Any], Awaitable[Any]],
+                 max_items: int = WRITE_QUEUE_MAX_ITEMS, max_delay_ms: float = WRITE_QUEUE_MAX_DELAY_MS):
+        self.name = name
+        self.session_factory = session_factory
+        self.apply_batch = apply_batch
+        self.apply_one = apply_one
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self.wakeup = asyncio.Event()
+        self.full = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+        self.items = 0
+        self.batches = 0
+        self.batch_failures = 0
+        self.item_failures = 0
+        self.busy_seconds = 0.0
+
+    async def submit(self, item):
+        if self.worker is None or self.worker.done():
+            # A fresh context, so the worker does not count its round trips
+            # against the request that happened to start it
+            self.worker = asyncio.create_task(self.run(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+        metrics.set_gauge(f"write_queue_depth_{self.name}", len(self.pending))
+        self.wakeup.set()
+        if len(self.pending) >= self.max_items:
+            self.full.set()
+        return await future
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            # Give the batch a moment to fill up, unless it already has
+            if len(self.pending) < self.max_items:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self.pending = self.pending[:self.max_items], self.pending[self.max_items:]
+            if not self.pending:
+                self.wakeup.clear()
+            if len(self.pending) < self.max_items:
+                self.full.clear()
+            metrics.set_gauge(f"write_queue_depth_{self.name}", len(self.pending))
+            if batch:
+                await self.flush(batch)
+
+    async def flush(self, batch: List[Tuple[Any, asyncio.Future]]):
+        started = time.perf_counter()
+        items = [item for item, _ in batch]
+        try:
+            async with self.session_factory() as session:
+                try:
+                    results = await self.apply_batch(session, items)
+                    outcomes = [(result, None) for result in results]
+                except Exception:
+                    self.batch_failures += 1
+                    metrics.increment(f"write_queue_batch_failures_{self.name}")
+                    outcomes = []
+                    for item in items:
+                        try:
+                            outcomes.append((await self.apply_one(session, item), None))
+                        except Exception as e:
+                            self.item_failures += 1
+                            outcomes.append((None, e))
+        except Exception as e:
+            outcomes = [(None, e)] * len(batch)
+
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self.items += len(batch)
+        self.batches += 1
+        self.busy_seconds += time.perf_counter() - started
+        metrics.increment(f"write_queue_items_{self.name}", len(batch))
+        metrics.increment(f"write_queue_batches_{self.name}")
+
+    # Fail whatever is still waiting and stop the worker (on shutdown)
+    def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        for _, future in self.pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Write queue closed"))
+        self.pending = []
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self.pending),
+            "items": self.items,
+            "batches": self.batches,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_failures": self.batch_failures,
+            "item_failures": self.item_failures,
+            "items_per_busy_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "max_items": self.max_items,
+            "max_delay_ms": self.max_delay * 1000,
+        }
@@ -31,29 +31,23 @@ export default function Dashboard() {
 
         const fetchData = async () => {
             try {
-                // Fetch user data
-                const resUser = await fetch(`${API_URL}/users/email/${userEmail}`)
-                if (!resUser.ok) {
+                // Fetch user data, connections and feed in one request
+                const res = await fetch(`${API_URL}/dashboard/${userEmail}`)
+                if (!res.ok) {
                     throw new Error('Failed to fetch user data')
                 }
-                const userData = await resUser.json()
-                setUser(userData)
+                const dashboardData = await res.json()
+                setUser(dashboardData.user)
 
-                // Fetch user connections
-                const resConnections = await fetch(`${API_URL}/users/${userEmail}/connections`)
-                if (!resConnections.ok) {
+                if (!dashboardData.connections) {
                     throw new Error('Failed to fetch connections')
                 }
-                const connectionsData = await resConnections.json()
-                setConnections(connectionsData.connections)
+                setConnections(dashboardData.connections.connections)
 
-                // Fetch user feed
-                const resFeed = await fetch(`${API_URL}/feed/${userData.id}`)
-                if (!resFeed.ok) {
+                if (!dashboardData.feed) {
                     throw new Error('Failed to fetch feed')
                 }
-                const feedData = await resFeed.json()
-                setPosts(feedData.feed)
+                setPosts(dashboardData.feed.feed)
 
                 setLoading(false)
             } catch (err) {
@@ -96,10 +90,12 @@ export default function Dashboard() {
             console.log(data.message)
 
             // Refresh connections
-            const resConnections = await fetch(`${API_URL}/users/${user.email}/connections`)
+            const resConnections = await fetch(`${API_URL}/dashboard/${user.email}?include=connections`)
             if (resConnections.ok) {
                 const connectionsData = await resConnections.json()
-                setConnections(connectionsData.connections)
+                if (connectionsData.connections) {
+                    setConnections(connectionsData.connections.connections)
+                }
             }
 
         } catch (err) {